@@ -0,0 +1,251 @@
+"""Offline benchmark suite for the flux engine.
+
+Usage (from the repository root, with ffmpeg on PATH):
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only split_audio excel_write --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json   # exit code 1 on a regression
+
+The YouTube API, the media host behind yt-dlp and the Whisper API are replaced by the
+local stubs in benchmarks/stubs.py, fed with recorded responses and synthetic MP3s.
+Each benchmark runs in a fresh process and reports wall time, throughput, peak RSS
+(of the benchmark process and of its ffmpeg children) and the flux stage timings.
+On Linux the children figure also counts the interpreter pages a child had before exec,
+so compare it between runs rather than reading it as ffmpeg's own footprint.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Import flux from this checkout
+
+import stubs
+
+TOLERANCE = 0.25  # Allowed relative drop in throughput / growth in peak RSS before a result counts as a regression
+
+# Function to read the peak resident set size (MB) of this process or of its finished children
+def peak_rss_mb(children=False):
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+###########################################################################
+############ Setup (parent process): synthetic inputs on disk #############
+###########################################################################
+
+def setup_split_audio(workdir, scale, stub):
+    stubs.make_synthetic_mp3(os.path.join(workdir, "long.mp3"), int(1800 * scale), bitrate="64k")
+
+def setup_transcription(workdir, scale, stub):
+    os.makedirs(os.path.join(workdir, "Audio"))
+    for i in range(max(1, int(8 * scale))):
+        stubs.make_synthetic_mp3(os.path.join(workdir, "Audio", f"talk_{i}.mp3"), 180, bitrate="64k")
+
+def setup_download(workdir, scale, stub):
+    for file_name in os.listdir(stub["media_folder"]):
+        os.remove(os.path.join(stub["media_folder"], file_name))
+    for i in range(max(1, int(6 * scale))):
+        stubs.make_synthetic_mp3(os.path.join(stub["media_folder"], f"upload_{i}.mp3"), 120)
+
+def setup_excel_write(workdir, scale, stub):
+    from flux.schema import VIDEO_FIELDS, flatten_items
+    from flux.store import ResultStore, result_store_name
+
+    video_item = stubs.load_fixture("videos_list.json")["items"][0]
+    result_store = ResultStore(os.path.join(workdir, result_store_name))
+    run_id = result_store.new_run()
+    frame = flatten_items([dict(video_item, id=f"{i:011d}") for i in range(int(20000 * scale))], VIDEO_FIELDS)
+    frame.insert(0, "Handle Name", "@metan-car-life")
+    for i in range(0, len(frame), 1000):
+        result_store.append_frame("videos", run_id, frame.iloc[i:i + 1000])
+    with open(os.path.join(workdir, "run_id.txt"), "w", encoding="utf-8") as f:
+        f.write(run_id)
+
+###########################################################################
+############ Benchmarks (child process): return processed units ###########
+###########################################################################
+
+def bench_get_videos_details(workdir, scale, stub):
+    from flux import youtube
+    from flux.client import TokenBucket
+
+    youtube.configure(api_key="bench", cache_path=os.path.join(workdir, "api_cache.sqlite3"), base_url=stub["youtube"])
+    youtube.get_api_client().bucket = TokenBucket(rate=10 ** 6, capacity=10 ** 6)  # Measure the client, not the throttle
+    video_ids = [f"{i:011d}" for i in range(int(2000 * scale))]
+    details = youtube.get_videos_details(video_ids)
+    youtube.get_video_details(video_ids[0])  # Single lookup, served from the cache
+    return len(details)
+
+def bench_split_audio(workdir, scale, stub):
+    from flux.audio import probe_audio, split_audio
+
+    file_path = os.path.join(workdir, "long.mp3")
+    duration, _ = probe_audio(file_path)
+    chunk_paths, _ = split_audio(file_path, max_chunk_bytes=2 * 1024 * 1024)
+    for chunk_path in chunk_paths:
+        os.remove(chunk_path)
+    return duration
+
+def bench_transcription(workdir, scale, stub):
+    from flux import transcribe
+    from flux.pipeline import transcribe_audio_folder
+
+    transcribe.configure(api_key="bench", base_url=f"{stub['whisper']}/v1")
+    # Failed files still get (empty) transcript outputs, so only files finished without errors are counted
+    failed = []
+    transcribed = []
+    def on_file_done(file_path, excel_file_path, text_file_path, errors):
+        (failed if errors else transcribed).append(file_path)
+    transcribe_audio_folder(workdir, on_file_done=on_file_done)
+    if failed:
+        raise RuntimeError(f"Transcription failed for {len(failed)} of {len(failed) + len(transcribed)} files")
+    return len(transcribed)
+
+def bench_download(workdir, scale, stub):
+    from flux.download import DownloadManifest, download_manifest_name, run_download_jobs
+
+    manifest = DownloadManifest(os.path.join(workdir, download_manifest_name))
+    manifest.add_jobs({
+        os.path.splitext(file_name)[0]: f"{stub['media']}/{file_name}"
+        for file_name in sorted(os.listdir(stub["media_folder"]))
+    })
+    audio_folder = os.path.join(workdir, "Audio")
+    os.makedirs(audio_folder)
+    counts = run_download_jobs(manifest, os.path.join(workdir, "Video"), audio_folder, audio_only=True)
+    return counts["done"]
+
+def bench_excel_write(workdir, scale, stub):
+    from flux.pipeline import export_videos, write_transcript_outputs
+    from flux.store import ResultStore, result_store_name
+
+    result_store = ResultStore(os.path.join(workdir, result_store_name))
+    with open(os.path.join(workdir, "run_id.txt"), "r", encoding="utf-8") as f:
+        run_id = f.read()
+    export_videos(result_store, os.path.join(workdir, "videos.xlsx"), run_id)
+
+    # Transcript writers: one hour of 5 s segments per file
+    data = [[f"{i * 5 // 60:02}:{i * 5 % 60:02}", f"{(i + 1) * 5 // 60:02}:{(i + 1) * 5 % 60:02}", f"セグメント {i} のテキスト"] for i in range(720)]
+    transcript_run_id = result_store.new_run()
+    files = max(1, int(10 * scale))
+    for i in range(files):
+        write_transcript_outputs(result_store, transcript_run_id, f"talk_{i}.mp3", data,
+                                 os.path.join(workdir, f"talk_{i}.xlsx"), os.path.join(workdir, f"talk_{i}.txt"))
+    return int(20000 * scale) + files * len(data)
+
+# name -> (setup or None, benchmark, unit of the processed amount)
+BENCHMARKS = {
+    "get_videos_details": (None, bench_get_videos_details, "videos"),
+    "split_audio": (setup_split_audio, bench_split_audio, "audio seconds"),
+    "transcription": (setup_transcription, bench_transcription, "files"),
+    "download": (setup_download, bench_download, "files"),
+    "excel_write": (setup_excel_write, bench_excel_write, "rows"),
+}
+
+# Function run in the child process: times one benchmark and sends its result back
+def run_child(name, workdir, scale, stub, results):
+    from flux.metrics import registry
+
+    os.chdir(workdir)
+    benchmark = BENCHMARKS[name][1]
+    started_at = time.perf_counter()
+    amount = benchmark(workdir, scale, stub)
+    seconds = time.perf_counter() - started_at
+    stages = {
+        histogram["labels"]["stage"]: {"count": histogram["count"], "seconds": histogram["sum"]}
+        for histogram in registry.snapshot()["histograms"] if histogram["name"] == "flux_stage_seconds"
+    }
+    results.put({
+        "name": name,
+        "amount": amount,
+        "unit": BENCHMARKS[name][2],
+        "seconds": round(seconds, 3),
+        "throughput": round(amount / seconds, 2) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "children_peak_rss_mb": peak_rss_mb(children=True),
+        "stages": stages,
+    })
+
+# Function to run one benchmark in a fresh process
+# stub holds the base URLs of the stub servers and the folder published by the media server
+def run_benchmark(name, scale, stub, keep=False):
+    workdir = tempfile.mkdtemp(prefix=f"flux-bench-{name}-")
+    try:
+        setup = BENCHMARKS[name][0]
+        if setup:
+            setup(workdir, scale, stub)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=run_child, args=(name, workdir, scale, stub, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            return {"name": name, "error": f"exit code {process.exitcode}"}
+        return results.get()
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# Function to list the regressions of results against a baseline file
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"])
+        if not previous or "error" in result or "error" in previous:
+            continue
+        if previous["throughput"] and result["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{result['name']}: throughput {result['throughput']} < {previous['throughput']} {result['unit']}/s")
+        if previous["peak_rss_mb"] and result["peak_rss_mb"] and result["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{result['name']}: peak RSS {result['peak_rss_mb']} > {previous['peak_rss_mb']} MB")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline flux benchmarks with stub YouTube, media and Whisper servers")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every input size (eg. 0.1 for a smoke run)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative regression (default: 0.25)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary work folders")
+    args = parser.parse_args(argv)
+
+    media_folder = tempfile.mkdtemp(prefix="flux-bench-media-")
+    stub = {
+        "youtube": stubs.start_server(stubs.YouTubeStubHandler)[1],
+        "whisper": stubs.start_server(stubs.WhisperStubHandler)[1],
+        "media": stubs.start_media_server(media_folder)[1],
+        "media_folder": media_folder,
+    }
+
+    results = []
+    for name in args.only or BENCHMARKS:
+        result = run_benchmark(name, args.scale, stub, keep=args.keep)
+        results.append(result)
+        if "error" in result:
+            print(f"{name:<20} FAILED ({result['error']})")
+        else:
+            print(f"{name:<20} {result['seconds']:>8.2f} s  {result['throughput']:>10.2f} {result['unit']}/s"
+                  f"  peak RSS {result['peak_rss_mb']} MB (children {result['children_peak_rss_mb']} MB)")
+    shutil.rmtree(media_folder, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({result["name"]: result for result in results}, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 1 if any("error" in result for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
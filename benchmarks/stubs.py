@@ -0,0 +1,129 @@
+"""Local stand-ins for the YouTube Data API, the media host behind yt-dlp and the Whisper API.
+
+Every server listens on 127.0.0.1 on a free port and runs in a daemon thread, so the
+benchmarks never leave the machine and always see the same responses.
+"""
+import copy
+import datetime
+import json
+import os
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Function to load a recorded API response from benchmarks/fixtures
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_FOLDER, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# Function to start a threaded HTTP server on a free local port, returning (server, base_url)
+def start_server(handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+class QuietHandler(BaseHTTPRequestHandler):
+    latency = 0.0  # Seconds added to every response
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        time.sleep(self.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class YouTubeStubHandler(QuietHandler):
+    """Replays the recorded videos/channels responses for any requested IDs.
+
+    playlistItems pages list `uploads_per_playlist` synthetic uploads, newest first.
+    """
+
+    video_item = load_fixture("videos_list.json")["items"][0]
+    channel_item = load_fixture("channels_list.json")["items"][0]
+    uploads_per_playlist = 200
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rsplit("/", 1)[-1]
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if endpoint == "videos":
+            self.send_json({"etag": "bench", "items": [self.clone(self.video_item, item_id) for item_id in params["id"].split(",")]})
+        elif endpoint == "channels" and "id" in params:
+            self.send_json({"etag": "bench", "items": [self.clone(self.channel_item, item_id) for item_id in params["id"].split(",")]})
+        elif endpoint == "channels":
+            name = (params.get("forHandle") or params.get("forUsername", "")).lstrip("@")
+            self.send_json({"items": [{"id": f"UC{name[:22].ljust(22, 'x')}"}]})
+        elif endpoint == "playlistItems":
+            self.send_json(self.playlist_page(params["playlistId"], int(params.get("pageToken") or 0), int(params.get("maxResults", 50))))
+        else:
+            self.send_json({"error": {"code": 404, "message": f"Unknown endpoint {endpoint}"}}, status=404)
+
+    def clone(self, item, item_id):
+        item = copy.deepcopy(item)
+        item["id"] = item_id
+        return item
+
+    def playlist_page(self, playlist_id, start, page_size):
+        end = min(start + page_size, self.uploads_per_playlist)
+        items = [
+            {"contentDetails": {
+                "videoId": f"{playlist_id[2:7]}{position:06d}",
+                "videoPublishedAt": (datetime.datetime(2024, 1, 1) - datetime.timedelta(hours=position)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }}
+            for position in range(start, end)
+        ]
+        page = {"items": items}
+        if end < self.uploads_per_playlist:
+            page["nextPageToken"] = str(end)
+        return page
+
+class WhisperStubHandler(QuietHandler):
+    """Answers /audio/transcriptions with a verbose_json transcript, one segment per `segment_seconds`."""
+
+    latency = 0.05
+    segment_seconds = 5
+    segments_per_chunk = 120
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))  # Consume the upload like the real API
+        segments = [
+            {"id": i, "start": i * self.segment_seconds, "end": (i + 1) * self.segment_seconds, "text": f"セグメント {i} のテキスト"}
+            for i in range(self.segments_per_chunk)
+        ]
+        self.send_json({"task": "transcribe", "language": "japanese", "duration": len(segments) * self.segment_seconds,
+                        "text": " ".join(segment["text"] for segment in segments), "segments": segments})
+
+class MediaStubHandler(SimpleHTTPRequestHandler):
+    """Serves the files of `folder`, so yt-dlp's generic extractor can download them."""
+
+    folder = "."
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=self.folder, **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+# Function to serve a folder of media files over HTTP
+def start_media_server(folder):
+    handler_class = type("FolderMediaStubHandler", (MediaStubHandler,), {"folder": folder})
+    return start_server(handler_class)
+
+# Function to create a synthetic speech-like MP3: a tone with a 2 s pause every 20 s
+def make_synthetic_mp3(path, seconds, bitrate="128k"):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+         "-af", "volume='if(lt(mod(t,20),18),1,0)':eval=frame", "-ac", "1", "-c:a", "libmp3lame", "-b:a", bitrate, path],
+        check=True,
+    )
+    return path
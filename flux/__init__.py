@@ -0,0 +1,42 @@
+"""Flux YouTube scraping, download and transcription engine.
+
+The Streamlit page and the command line (python -m flux) are thin clients over
+the functions exported here; importing this package does not import Streamlit.
+"""
+from flux.audio import split_audio
+from flux.download import download_media, run_download_jobs
+from flux.inputs import normalize_handles, normalize_video_links
+from flux.pipeline import (
+    crawl_channel_uploads,
+    download_videos,
+    export_latest_results,
+    load_results,
+    run_pipeline,
+    scrape_channels,
+    scrape_videos,
+    transcribe_audio_folder,
+)
+from flux.streaming import run_streaming_pipeline
+from flux.transcribe import transcribe_files
+from flux.youtube import get_channels_details, get_video_details, get_videos_details
+
+__all__ = [
+    "crawl_channel_uploads",
+    "download_media",
+    "download_videos",
+    "export_latest_results",
+    "get_channels_details",
+    "get_video_details",
+    "get_videos_details",
+    "load_results",
+    "normalize_handles",
+    "normalize_video_links",
+    "run_download_jobs",
+    "run_pipeline",
+    "run_streaming_pipeline",
+    "scrape_channels",
+    "scrape_videos",
+    "split_audio",
+    "transcribe_audio_folder",
+    "transcribe_files",
+]
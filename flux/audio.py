@@ -0,0 +1,180 @@
+"""Audio preprocessing and chunking with ffmpeg, streaming so memory stays flat regardless of input length."""
+import bisect
+import csv
+import json
+import math
+import os
+import re
+import subprocess
+import tempfile
+
+from flux.metrics import StageTimer, registry
+
+WHISPER_MAX_BYTES = 25 * 1024 * 1024  # Upload limit of the transcription API
+CHUNK_TARGET_BYTES = 24 * 1024 * 1024  # Leave headroom for container overhead
+SILENCE_NOISE_DB = -35  # Below this level audio counts as silence
+SILENCE_MIN_SECONDS = 0.4  # Shortest pause that can be used as a split point
+SILENCE_SEARCH_SECONDS = 30  # How far before a planned split point to look for a pause
+
+# Upload format: Whisper works on 16 kHz mono internally, so anything above that is wasted upload bytes
+PREPROCESS_SAMPLE_RATE = 16000
+PREPROCESS_BITRATE = "32k"  # About 14 MB per hour, so an hour-long file fits in a single chunk
+PREPROCESS_FORMAT = "mp3"  # "opus" is smaller at the same quality but needs an ffmpeg built with libopus
+PREPROCESS_CODECS = {"mp3": ("mp3", ["-c:a", "libmp3lame"]), "opus": ("ogg", ["-c:a", "libopus", "-application", "voip"])}
+PREPROCESS_WORKERS = os.cpu_count() or 1  # Files encoded at once (each ffmpeg process uses one core)
+TRIM_MIN_SECONDS = 2.0  # Pauses longer than this are shortened when trimming silence
+TRIM_KEEP_SECONDS = 0.5  # Length a trimmed pause is shortened to
+TRIM_FRAME_SAMPLES = 160  # Trimming works on 10 ms frames at 16 kHz, so the offset map is exact
+
+# Function to read duration (s) and bitrate (bit/s) of an audio file with ffprobe
+def probe_audio(file_path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration,bit_rate", "-of", "json", file_path],
+        capture_output=True, text=True, check=True,
+    )
+    info = json.loads(result.stdout)["format"]
+    return float(info["duration"]), int(info.get("bit_rate") or 0)
+
+# Function to find pauses in an audio file; ffmpeg decodes it as a stream, so memory stays flat
+def detect_silences(file_path, noise_db=SILENCE_NOISE_DB, min_seconds=SILENCE_MIN_SECONDS):
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", file_path, "-vn",
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_seconds}", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    starts = [float(x) for x in re.findall(r"silence_start: (-?[\d.]+)", result.stderr)]
+    ends = [float(x) for x in re.findall(r"silence_end: ([\d.]+)", result.stderr)]
+    return list(zip(starts, ends))
+
+# Function to plan split times at most `chunk_seconds` apart, moved back to the middle of a pause when one is close
+def plan_split_points(duration, chunk_seconds, silences=(), search_seconds=SILENCE_SEARCH_SECONDS):
+    midpoints = [(start + end) / 2 for start, end in silences]
+    split_points = []
+    position = 0.0
+    while duration - position > chunk_seconds:
+        limit = position + chunk_seconds
+        candidates = [m for m in midpoints if limit - search_seconds <= m <= limit and m > position]
+        position = max(candidates) if candidates else limit
+        split_points.append(position)
+    return split_points
+
+# Function to split audio into chunks below the Whisper upload limit and return correct start times
+# Cuts on MP3 frame boundaries without decoding (stream copy), or re-encodes in the same single ffmpeg pass
+@StageTimer("split")
+def split_audio(file_path, max_chunk_bytes=CHUNK_TARGET_BYTES, silence_aware=True, reencode_bitrate=None):
+    duration, bit_rate = probe_audio(file_path)
+    if reencode_bitrate:
+        bit_rate = int(reencode_bitrate.rstrip("k")) * 1000
+    if not bit_rate:
+        bit_rate = int(os.path.getsize(file_path) * 8 / max(duration, 1))
+    chunk_seconds = max_chunk_bytes * 8 / bit_rate * 0.95  # Safety margin for VBR peaks
+
+    silences = detect_silences(file_path) if silence_aware else []
+    split_points = plan_split_points(duration, chunk_seconds, silences)
+
+    base_name, ext = os.path.splitext(file_path)
+    segment_list_path = f"{base_name}_parts.csv"
+    codec = ["-c:a", "libmp3lame", "-b:a", reencode_bitrate] if reencode_bitrate else ["-c", "copy"]
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-i", file_path, "-vn", "-map", "0:a", *codec,
+               "-f", "segment", "-segment_list", segment_list_path, "-segment_list_type", "csv",
+               "-reset_timestamps", "1"]
+    if split_points:
+        command += ["-segment_times", ",".join(f"{point:.3f}" for point in split_points)]
+    else:
+        command += ["-segment_time", str(int(duration) + 1)]
+    subprocess.run(command + [f"{base_name}_part%d{ext}"], check=True)
+
+    chunk_paths = []
+    chunk_start_times = []  # Store start times for timestamp correction
+    with open(segment_list_path, newline="", encoding="utf-8") as f:
+        # ffmpeg reports where each segment really starts, which can differ slightly from the request
+        for chunk_name, start_time, _ in csv.reader(f):
+            chunk_paths.append(os.path.join(os.path.dirname(file_path), chunk_name))
+            chunk_start_times.append(float(start_time))
+    os.remove(segment_list_path)
+
+    registry.inc("flux_split_chunks", len(chunk_paths))
+    return chunk_paths, chunk_start_times
+
+# Function to plan the 10 ms frames to keep when long pauses are shortened to keep_seconds
+# Returns [(first_frame, last_frame)] spans, both inclusive
+def plan_kept_frames(duration, silences, min_seconds=TRIM_MIN_SECONDS, keep_seconds=TRIM_KEEP_SECONDS):
+    frames_per_second = PREPROCESS_SAMPLE_RATE / TRIM_FRAME_SAMPLES
+    spans = []
+    position = 0
+    for start, end in silences:
+        if end - start < min_seconds:
+            continue
+        cut_start = math.ceil((start + keep_seconds / 2) * frames_per_second)
+        cut_end = math.floor((end - keep_seconds / 2) * frames_per_second)
+        if cut_start > position:
+            spans.append((position, cut_start - 1))
+        position = max(position, cut_end)
+    last_frame = math.ceil(duration * frames_per_second)
+    if last_frame > position:
+        spans.append((position, last_frame))
+    return spans
+
+# Function to build the offset map of kept frame spans: [[start in trimmed audio, start in original audio]] in seconds
+def build_offset_map(spans):
+    seconds_per_frame = TRIM_FRAME_SAMPLES / PREPROCESS_SAMPLE_RATE
+    offset_map = []
+    output_frames = 0
+    for first_frame, last_frame in spans:
+        offset_map.append([output_frames * seconds_per_frame, first_frame * seconds_per_frame])
+        output_frames += last_frame - first_frame + 1
+    return offset_map
+
+# Function to map a time in trimmed audio back to the original timeline
+def to_original_time(seconds, offset_map):
+    if not offset_map:
+        return seconds
+    index = max(bisect.bisect_right(offset_map, [seconds, math.inf]) - 1, 0)
+    output_start, original_start = offset_map[index]
+    return original_start + seconds - output_start
+
+# Function to name the preprocessing settings, so transcripts of differently prepared audio are cached apart
+def preprocess_variant(trim_silence=False, bitrate=PREPROCESS_BITRATE, audio_format=PREPROCESS_FORMAT):
+    variant = f"{audio_format}-{PREPROCESS_SAMPLE_RATE}-{bitrate}"
+    if trim_silence:
+        variant += f"-trim{TRIM_MIN_SECONDS}-{TRIM_KEEP_SECONDS}"
+    return variant
+
+# Function to re-encode audio for upload: mono, 16 kHz, low bitrate, optionally with long pauses shortened
+# Writes a temporary file and returns (its path, offset map); the offset map is empty unless pauses were trimmed
+# Files that are already at or below the upload bitrate are returned unchanged when nothing needs trimming
+@StageTimer("preprocess")
+def preprocess_audio(file_path, bitrate=PREPROCESS_BITRATE, audio_format=PREPROCESS_FORMAT, trim_silence=False):
+    duration, bit_rate = probe_audio(file_path)
+    target_bit_rate = int(bitrate.rstrip("k")) * 1000
+    offset_map = []
+    filters = [f"aresample={PREPROCESS_SAMPLE_RATE}"]
+    if trim_silence:
+        spans = plan_kept_frames(duration, detect_silences(file_path, min_seconds=TRIM_MIN_SECONDS))
+        if len(spans) > 1 or (spans and spans[0][0] > 0):
+            offset_map = build_offset_map(spans)
+            select = "+".join(f"between(n,{first_frame},{last_frame})" for first_frame, last_frame in spans)
+            filters += [f"asetnsamples=n={TRIM_FRAME_SAMPLES}:p=0", f"aselect='{select}'", "asetpts=N/SR/TB"]
+    if not offset_map and bit_rate and bit_rate <= target_bit_rate * 1.25:
+        return file_path, []
+
+    ext, codec = PREPROCESS_CODECS[audio_format]
+    handle, output_path = tempfile.mkstemp(prefix="flux-", suffix=f".{ext}")
+    os.close(handle)
+    # The filter goes through a script file: one between() per kept span can exceed the command line limit
+    handle, filter_path = tempfile.mkstemp(prefix="flux-", suffix=".filter")
+    with os.fdopen(handle, "w", encoding="utf-8") as f:
+        f.write(",".join(filters))
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", file_path, "-vn", "-map", "0:a:0", "-filter_script:a", filter_path,
+             "-ac", "1", *codec, "-b:a", bitrate, output_path],
+            check=True,
+        )
+    except Exception:
+        os.remove(output_path)
+        raise
+    finally:
+        os.remove(filter_path)
+    registry.inc("flux_preprocess_bytes_saved", max(os.path.getsize(file_path) - os.path.getsize(output_path), 0))
+    return output_path, offset_map
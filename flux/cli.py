@@ -0,0 +1,143 @@
+"""Command line entry point for running the pipeline without Streamlit.
+
+Examples:
+    python -m flux run --channels handles.xlsx --videos links.xlsx --out DIR
+    python -m flux crawl --out DIR
+    python -m flux estimate --channels handles.xlsx --videos links.xlsx
+    python -m flux logs --tail 50 --level WARNING
+
+API keys are read from the YOUTUBE_API_KEY and OPENAI_API_KEY environment variables
+(OPENAI_BASE_URL optionally points transcription at another endpoint).
+"""
+import argparse
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from flux import youtube
+from flux.client import QuotaExceededError
+from flux.inputs import normalize_video_links
+from flux.logs import log_file_name, setup_logging, tail_records
+from flux.metrics import registry
+from flux.pipeline import crawl_channel_uploads, export_latest_results, run_pipeline, scrape_channels
+from flux.streaming import run_streaming_pipeline
+from flux.youtube import estimate_quota
+
+# Function to read one column of an Excel sheet as a list of strings (first column by default)
+def read_column(excel_path, column_name=None):
+    df = pd.read_excel(excel_path)
+    column = df[column_name] if column_name else df.iloc[:, 0]
+    return column.dropna().astype(str).tolist()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="flux", description="YouTube scraping, download and transcription pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Options shared by the commands that call the YouTube API
+    api_options = argparse.ArgumentParser(add_help=False)
+    api_options.add_argument("--daily-quota", type=int, help="daily YouTube API quota budget in units (default: 10000)")
+    api_options.add_argument("--metrics", help="also write stage timings and API metrics to this file (.json, or .prom for OpenMetrics)")
+
+    run = commands.add_parser("run", parents=[api_options], help="run the pipeline stages back to back")
+    run.add_argument("--out", required=True, help="folder for all outputs (same layout as the Streamlit app)")
+    run.add_argument("--channels", help="Excel file with YouTube channel handles")
+    run.add_argument("--channel-column", help="column with the handles (default: first column)")
+    run.add_argument("--videos", help="Excel file with YouTube video links")
+    run.add_argument("--video-column", help="column with the links (default: first column)")
+    run.add_argument("--audio-only", action="store_true", help="download MP3 only, skip MP4")
+    run.add_argument("--trim-silence", action="store_true", help="cut long pauses before transcription (timestamps still match the original audio)")
+    run.add_argument("--no-download", action="store_true", help="skip the download stage")
+    run.add_argument("--no-transcribe", action="store_true", help="skip the transcription stage")
+    run.add_argument("--streaming", action="store_true",
+                     help="stream the videos through download and transcription instead of finishing each stage first")
+
+    crawl = commands.add_parser("crawl", parents=[api_options], help="list new uploads of the stored (or given) channels into the video sheet")
+    crawl.add_argument("--out", required=True, help="folder used by a previous channel scrape")
+    crawl.add_argument("--channels", help="Excel file with YouTube channel handles to scrape first")
+    crawl.add_argument("--channel-column", help="column with the handles (default: first column)")
+
+    estimate = commands.add_parser("estimate", parents=[api_options], help="estimate the YouTube API quota a run would use")
+    estimate.add_argument("--channels", help="Excel file with YouTube channel handles")
+    estimate.add_argument("--channel-column", help="column with the handles (default: first column)")
+    estimate.add_argument("--videos", help="Excel file with YouTube video links")
+    estimate.add_argument("--video-column", help="column with the links (default: first column)")
+
+    logs = commands.add_parser("logs", help="show the newest records of the JSONL log")
+    logs.add_argument("--file", default=log_file_name, help=f"log file (default: {log_file_name})")
+    logs.add_argument("--tail", type=int, default=50, help="number of records to show (default: 50)")
+    logs.add_argument("--run-id", help="only records of this run")
+    logs.add_argument("--level", choices=["INFO", "WARNING", "ERROR"], help="only records at or above this level")
+
+    export = commands.add_parser("export", help="re-export the latest stored channel and video data to Excel")
+    export.add_argument("--out", required=True, help="folder used by a previous run")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "logs":
+        for record in tail_records(args.file, limit=args.tail, run_id=args.run_id, min_level=args.level):
+            print(f"{record['time']} {record['level']:<7} {record.get('run_id') or '-'} {record['message']}")
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    setup_logging()  # Same JSONL log as the Streamlit app when run from the same folder
+
+    if args.command == "export":
+        for excel_path, run_id in export_latest_results(args.out):
+            print(f"{excel_path} (run {run_id})")
+        return 0
+
+    youtube.configure(daily_quota=args.daily_quota)
+    try:
+        return run_command(args)
+    except QuotaExceededError as e:
+        print(f"Stopped: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if args.metrics:
+            registry.write(args.metrics)
+
+# Function to run one of the commands that call the YouTube API
+def run_command(args):
+    if args.command == "estimate":
+        video_urls = read_column(args.videos, args.video_column) if args.videos else []
+        estimate = estimate_quota(
+            handles=read_column(args.channels, args.channel_column) if args.channels else (),
+            video_ids=normalize_video_links(video_urls)[0],
+        )
+        print(f"expected {estimate['expected']} units, worst case {estimate['worst_case']}, {estimate['remaining']} left today")
+        return 0
+
+    if args.command == "crawl":
+        os.makedirs(args.out, exist_ok=True)
+        if args.channels:
+            scrape_channels(read_column(args.channels, args.channel_column), args.out)
+        video_data_path, new_videos = crawl_channel_uploads(args.out)
+        print(f"{new_videos} new videos → {video_data_path}")
+        return 0
+
+    if args.streaming:
+        if not args.videos:
+            build_parser().error("--streaming needs --videos")
+        os.makedirs(args.out, exist_ok=True)
+        if args.channels:
+            scrape_channels(read_column(args.channels, args.channel_column), args.out)
+        summary = run_streaming_pipeline(args.out, read_column(args.videos, args.video_column), audio_only=args.audio_only, trim_silence=args.trim_silence)
+        print(summary)
+        return 0
+
+    run_pipeline(
+        args.out,
+        handles=read_column(args.channels, args.channel_column) if args.channels else (),
+        video_urls=read_column(args.videos, args.video_column) if args.videos else (),
+        download=not args.no_download,
+        transcribe=not args.no_transcribe,
+        audio_only=args.audio_only,
+        trim_silence=args.trim_silence,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
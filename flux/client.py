@@ -0,0 +1,141 @@
+"""Shared YouTube Data API client: pooled session, quota accounting, throttling, retries and metrics."""
+import datetime
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from flux.metrics import registry
+
+DAILY_QUOTA = 10000  # Default daily quota of a YouTube Data API project (units)
+QUOTA_COSTS = {"search": 100}  # Units per call; every other read endpoint costs 1
+DEFAULT_QUOTA_COST = 1
+REQUESTS_PER_SECOND = 10  # Steady request rate shared by all threads
+REQUEST_BURST = 20  # Requests that may be sent at once after an idle period
+API_RETRIES = 4  # Retries on 429 / 5xx / connection errors
+API_TIMEOUT = 30  # Seconds per request
+
+# Function to get the current quota day (the API quota resets at midnight Pacific time)
+def quota_day():
+    try:
+        from zoneinfo import ZoneInfo
+        pacific = ZoneInfo("America/Los_Angeles")
+    except Exception:  # No tz database (eg. Windows without tzdata)
+        pacific = datetime.timezone(datetime.timedelta(hours=-8))
+    return datetime.datetime.now(pacific).strftime("%Y-%m-%d")
+
+class QuotaExceededError(RuntimeError):
+    """Raised when a call (or a planned run) would go over the daily quota budget."""
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and up to `capacity` at once."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=REQUEST_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ApiClient:
+    """Sends GET requests to one API, charging each call against a daily quota budget.
+
+    Usage is kept in memory and, when a ledger (see ApiCache) is given, persisted per
+    quota day so several runs on the same day share one budget.
+    """
+
+    def __init__(self, base_url, api_key=None, daily_quota=DAILY_QUOTA, ledger=None,
+                 rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST, retries=API_RETRIES, pool_size=16):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.daily_quota = daily_quota
+        self.ledger = ledger
+        self.retries = retries
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = threading.Lock()
+        self.usage = {}  # {quota day: units} when no ledger is configured
+        # Keep-alive session so all API calls reuse pooled connections
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+
+    @staticmethod
+    def cost(endpoint):
+        return QUOTA_COSTS.get(endpoint, DEFAULT_QUOTA_COST)
+
+    def quota_used(self):
+        day = quota_day()
+        if self.ledger is not None:
+            return self.ledger.quota_used(day)
+        return self.usage.get(day, 0)
+
+    def quota_remaining(self):
+        return max(0, self.daily_quota - self.quota_used())
+
+    def charge(self, endpoint):
+        """Books the units of one call, refusing it when the budget would be exceeded."""
+        units = self.cost(endpoint)
+        day = quota_day()
+        with self.lock:
+            if self.quota_used() + units > self.daily_quota:
+                raise QuotaExceededError(f"{endpoint}.list needs {units} units but only {self.quota_remaining()} of {self.daily_quota} are left today")
+            if self.ledger is not None:
+                self.ledger.add_quota_usage(day, endpoint, units)
+            else:
+                self.usage[day] = self.usage.get(day, 0) + units
+        registry.inc("youtube_api_quota_units", units, endpoint=endpoint)
+
+    def get(self, endpoint, params, headers=None):
+        """Returns the response of GET base_url/endpoint; only 429, 5xx and connection errors are retried."""
+        params = dict(params, key=self.api_key)
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            self.charge(endpoint)  # Every attempt that reaches the API is billed
+            started_at = time.monotonic()
+            try:
+                response = self.session.get(f"{self.base_url}/{endpoint}", params=params, headers=headers or {}, timeout=API_TIMEOUT)
+            except requests.ConnectionError as e:
+                registry.inc("youtube_api_errors", endpoint=endpoint, status="connection")
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_delay(None, attempt)
+                logging.warning(f"{endpoint}.list connection error (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                continue
+            registry.observe("youtube_api_latency_seconds", time.monotonic() - started_at, endpoint=endpoint)
+
+            if response.status_code >= 400:
+                registry.inc("youtube_api_errors", endpoint=endpoint, status=str(response.status_code))
+            if response.status_code == 403 and "quotaExceeded" in response.text:
+                raise QuotaExceededError(f"{endpoint}.list was refused: the daily quota of the API key is used up")
+            if (response.status_code == 429 or response.status_code >= 500) and attempt < self.retries:
+                delay = self.retry_delay(response, attempt)
+                logging.warning(f"{endpoint}.list returned {response.status_code} (attempt {attempt + 1}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            return response
+
+    @staticmethod
+    def retry_delay(response, attempt):
+        """Retry-After when the server sent one, else exponential backoff with jitter."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(60, 2 ** attempt) * random.uniform(0.5, 1.5)
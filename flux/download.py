@@ -0,0 +1,239 @@
+"""Media downloads with yt-dlp: single-pass MP4 + MP3 and a resumable parallel scheduler."""
+import json
+import logging
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import yt_dlp as yt_dlp
+from yt_dlp.postprocessor import PostProcessor
+
+from flux.metrics import StageTimer, registry
+
+ARTIFACT_TEMPLATE = "%(id).2s/%(id)s.%(ext)s"  # yt-dlp output template: Audio/ab/abcdefghijk.mp3
+VIDEO_EXTENSIONS = ("mp4", "mkv", "webm")  # Containers a merged video download can end up in
+
+# Function to get the path of a video's artifact: sharded by the first two characters of its ID
+def artifact_path(folder, video_id, ext):
+    return os.path.join(folder, video_id[:2], f"{video_id}.{ext}")
+
+# Function to find the files a finished download of a video left on disk, without listing any folder
+# Returns the paths (video first, then MP3) or None when something is missing
+def existing_artifacts(video_id, video_folder, audio_folder, audio_only=False):
+    mp3_path = artifact_path(audio_folder, video_id, "mp3")
+    if not os.path.exists(mp3_path):
+        return None
+    if audio_only:
+        return [mp3_path]
+    for ext in VIDEO_EXTENSIONS:
+        if os.path.exists(artifact_path(video_folder, video_id, ext)):
+            return [artifact_path(video_folder, video_id, ext), mp3_path]
+    return None
+
+MP3_QUALITY = "192"  # kbps of the generated MP3 files
+DOWNLOAD_WORKERS = 4  # Concurrent yt-dlp workers in Step 4
+DOWNLOADS_PER_HOST = 3  # Concurrent downloads allowed against a single host
+DOWNLOAD_RETRIES = 3  # Job-level retries on top of yt-dlp's own fragment retries
+DOWNLOAD_RATE_LIMIT = None  # Bytes per second per download (None = unlimited)
+download_manifest_name = "02_Download_Manifest.json"
+title_manifest_name = "02_Video_Titles.json"
+
+class RecordFilesPP(PostProcessor):
+    """Collects the final path of every downloaded item."""
+
+    def __init__(self, files):
+        super().__init__()
+        self.files = files
+
+    def run(self, info):
+        self.files.append(info["filepath"])
+        return [], info
+
+class LocalMp3PP(RecordFilesPP):
+    """Writes an MP3 of each finished download into audio_folder with ffmpeg, so audio is fetched only once."""
+
+    def __init__(self, audio_folder, files, quality=MP3_QUALITY):
+        super().__init__(files)
+        self.audio_folder = audio_folder
+        self.quality = quality
+
+    def run(self, info):
+        source_path = info["filepath"]
+        mp3_path = artifact_path(self.audio_folder, info["id"], "mp3")
+        os.makedirs(os.path.dirname(mp3_path), exist_ok=True)
+        if not os.path.exists(mp3_path):
+            self.to_screen(f"Extracting MP3 from {source_path}")
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", source_path, "-vn",
+                 "-codec:a", "libmp3lame", "-b:a", f"{self.quality}k", mp3_path],
+                check=True,
+            )
+        self.files.extend([source_path, mp3_path])
+        return [], info
+
+# Function to download videos (MP4 + MP3) or audio only (MP3) with a single network pass per item
+# Files are named by video ID (see artifact_path); titles live in the title manifest
+# Returns the paths of the files that were produced
+def download_media(youtube_links, video_folder, audio_folder, audio_only=False, progress_hooks=()):
+    files = []
+    if audio_only:
+        ydl_opts = {
+            'outtmpl': os.path.join(audio_folder, ARTIFACT_TEMPLATE),
+            'format': 'bestaudio/best',
+            'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': MP3_QUALITY}],
+            'progress_hooks': list(progress_hooks),
+            'continuedl': True,  # Resume .part files left by an interrupted run
+            'ratelimit': DOWNLOAD_RATE_LIMIT,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.add_post_processor(RecordFilesPP(files), when="after_move")
+            ydl.download(youtube_links)
+        return files
+
+    ydl_opts = {
+        'outtmpl': os.path.join(video_folder, ARTIFACT_TEMPLATE),
+        'format': 'bestvideo+bestaudio/best',
+        'progress_hooks': list(progress_hooks),
+        'continuedl': True,  # Resume .part files left by an interrupted run
+        'ratelimit': DOWNLOAD_RATE_LIMIT,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # Runs after the merged file is in place, deriving the MP3 from it locally
+        ydl.add_post_processor(LocalMp3PP(audio_folder, files), when="after_move")
+        ydl.download(youtube_links)
+    return files
+
+class DownloadManifest:
+    """Persistent Step 4 job state (queued/running/done/failed, bytes, retries) stored as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f)
+        # Jobs that were running when the page was interrupted are queued again and resumed
+        for job in self.jobs.values():
+            if job["status"] == "running":
+                job["status"] = "queued"
+
+    def add_jobs(self, links_by_id):
+        with self.lock:
+            for video_id, url in links_by_id.items():
+                if video_id not in self.jobs:
+                    self.jobs[video_id] = {"url": url, "status": "queued", "bytes": 0, "retries": 0, "files": [], "error": None}
+            self.save()
+
+    def update(self, video_id, **fields):
+        with self.lock:
+            self.jobs[video_id].update(fields, updated_at=time.time())
+            self.save()
+
+    def is_done(self, video_id, audio_only=False):
+        """A job finished in MP3-only mode is not done for an MP4 + MP3 download."""
+        job = self.jobs.get(video_id)
+        if not job or job["status"] != "done" or not all(os.path.exists(path) for path in job["files"]):
+            return False
+        return audio_only or any(not path.endswith(".mp3") for path in job["files"])
+
+    def counts(self, video_ids=None):
+        """Counts jobs per status, of the given IDs or of the whole manifest."""
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for video_id in self.jobs if video_ids is None else video_ids:
+            if video_id in self.jobs:
+                counts[self.jobs[video_id]["status"]] += 1
+        return counts
+
+    def save(self):
+        """Writes atomically so an interrupted save never corrupts the manifest (caller holds the lock)."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+class TitleManifest:
+    """Sidecar JSON map of video ID -> title for the ID-named artifacts of a save folder."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.titles = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.titles = json.load(f)
+
+    def update(self, titles):
+        with self.lock:
+            changed = {video_id: title for video_id, title in titles.items() if title and self.titles.get(video_id) != title}
+            if changed:
+                self.titles.update(changed)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.titles, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+
+# Function to run one download job with retries, reporting bytes and output files to the manifest
+def run_download_job(manifest, video_id, video_folder, audio_folder, audio_only, host_limits):
+    job = manifest.jobs[video_id]
+    downloaded = {}
+    # Failed jobs (and jobs done in MP3-only mode, now needed with the MP4) start over with fresh retries
+    if job["status"] in ("done", "failed"):
+        manifest.update(video_id, status="queued", retries=0)
+
+    # Files of an earlier run whose manifest entry was lost are found by ID, without downloading again
+    files = existing_artifacts(video_id, video_folder, audio_folder, audio_only)
+    if files:
+        manifest.update(video_id, status="done", error=None, files=files)
+        return True
+
+    def job_hook(d):
+        downloaded[d.get("filename")] = d.get("downloaded_bytes") or 0
+
+    with host_limits[urlparse(job["url"]).netloc]:
+        for attempt in range(job["retries"], DOWNLOAD_RETRIES + 1):
+            manifest.update(video_id, status="running", retries=attempt)
+            try:
+                with StageTimer("download"):
+                    files = download_media([job["url"]], video_folder, audio_folder, audio_only=audio_only, progress_hooks=[job_hook])
+            except Exception as e:
+                logging.warning(f"Download failed for {video_id} (attempt {attempt + 1}): {e}")
+                manifest.update(video_id, error=str(e), bytes=sum(downloaded.values()))
+                if attempt < DOWNLOAD_RETRIES:
+                    registry.inc("flux_download_retries")
+                    time.sleep(min(60, 2 ** attempt) + random.random())
+                continue
+            logging.info(f"Download finished: {video_id} → {files}")
+            registry.inc("flux_download_bytes", sum(downloaded.values()))
+            manifest.update(video_id, status="done", error=None, bytes=sum(downloaded.values()), files=files)
+            return True
+    manifest.update(video_id, status="failed")
+    return False
+
+# Function to download many videos with N concurrent workers, skipping finished jobs and resuming the rest
+# Only the jobs of video_ids (all jobs of the manifest when None) are run and counted
+def run_download_jobs(manifest, video_folder, audio_folder, audio_only=False, workers=DOWNLOAD_WORKERS, on_progress=None, video_ids=None):
+    video_ids = list(manifest.jobs) if video_ids is None else [video_id for video_id in dict.fromkeys(video_ids) if video_id in manifest.jobs]
+    host_limits = {}
+    pending = []
+    for video_id in video_ids:
+        if manifest.is_done(video_id, audio_only):
+            continue
+        host_limits.setdefault(urlparse(manifest.jobs[video_id]["url"]).netloc, threading.BoundedSemaphore(DOWNLOADS_PER_HOST))
+        pending.append(video_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_download_job, manifest, video_id, video_folder, audio_folder, audio_only, host_limits)
+            for video_id in pending
+        ]
+        # Progress is reported from the calling thread so Streamlit widgets can be updated safely
+        for future in as_completed(futures):
+            future.result()
+            if on_progress:
+                on_progress(manifest.counts(video_ids))
+    return manifest.counts(video_ids)
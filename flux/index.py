@@ -0,0 +1,110 @@
+"""Persistent index of known video and channel IDs and their local artifacts.
+
+One SQLite file (next to the API cache) is shared by every sheet, run and save folder, so a
+video that was already downloaded or transcribed anywhere is resolved locally instead of
+being fetched again, and a handle resolved once is not looked up on the API again.
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+artifact_index_file = "artifact_index.sqlite3"
+ARTIFACT_KINDS = ("video_path", "audio_path", "transcript_path", "timestamp_transcript_path")
+
+class ArtifactIndex:
+    """SQLite map of video ID -> title and MP4/MP3/transcript paths, and of handle -> channel ID."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY, title TEXT,
+                {", ".join(f"{kind} TEXT" for kind in ARTIFACT_KINDS)}, updated_at REAL);
+            CREATE INDEX IF NOT EXISTS videos_audio ON videos (audio_path);
+            CREATE TABLE IF NOT EXISTS channels (
+                handle TEXT PRIMARY KEY, channel_id TEXT, updated_at REAL);
+        """)
+
+    def upsert(self, table, key_column, key, **fields):
+        """Inserts or updates one row (caller holds the lock)."""
+        columns = [key_column, *fields, "updated_at"]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        self.conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({key_column}) DO UPDATE SET {updates}",
+            [key, *fields.values(), time.time()],
+        )
+
+    def record_videos(self, titles):
+        """Records the title of every {video_id: title}."""
+        with self.lock:
+            for video_id, title in titles.items():
+                self.upsert("videos", "video_id", video_id, title=title)
+            self.conn.commit()
+
+    def record_channels(self, channel_ids):
+        """Records the channel ID of every {handle: channel_id}."""
+        with self.lock:
+            for handle, channel_id in channel_ids.items():
+                self.upsert("channels", "handle", handle.lower(), channel_id=channel_id)
+            self.conn.commit()
+
+    def find_channel_id(self, handle):
+        """Returns the channel ID a handle was resolved to before, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT channel_id FROM channels WHERE handle = ?", (handle.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def record_files(self, video_id, **paths):
+        """Records artifact paths of one video, eg. record_files(video_id, audio_path=...)."""
+        assert set(paths) <= set(ARTIFACT_KINDS)
+        with self.lock:
+            self.upsert("videos", "video_id", video_id, **{kind: os.path.abspath(path) for kind, path in paths.items()})
+            self.conn.commit()
+
+    def lookup(self, video_ids):
+        """Returns {video_id: row} for indexed videos; artifact paths whose file is gone read as None."""
+        rows = {}
+        with self.lock:
+            for video_id in dict.fromkeys(video_ids):
+                cursor = self.conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,))
+                row = cursor.fetchone()
+                if row:
+                    rows[video_id] = dict(zip([column[0] for column in cursor.description], row))
+        for row in rows.values():
+            for kind in ARTIFACT_KINDS:
+                if row[kind] and not os.path.exists(row[kind]):
+                    row[kind] = None
+        return rows
+
+    def find_video_id(self, kind, path):
+        """Returns the video ID an artifact file belongs to, or None."""
+        assert kind in ARTIFACT_KINDS
+        with self.lock:
+            row = self.conn.execute(f"SELECT video_id FROM videos WHERE {kind} = ?", (os.path.abspath(path),)).fetchone()
+        return row[0] if row else None
+
+artifact_index = None  # Opened on first use, see get_artifact_index()
+artifact_index_lock = threading.Lock()
+
+# Function to get the shared artifact index, opening it on first use
+def get_artifact_index():
+    global artifact_index
+    with artifact_index_lock:
+        if artifact_index is None:
+            artifact_index = ArtifactIndex(artifact_index_file)
+    return artifact_index
+
+# Function to make an artifact available at target: hard link when possible, copy otherwise
+def link_artifact(path, target):
+    if os.path.abspath(target) == os.path.abspath(path) or os.path.exists(target):
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(path, target)
+    except OSError:  # Other drive or a file system without hard links
+        shutil.copy2(path, target)
+    return target
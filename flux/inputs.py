@@ -0,0 +1,65 @@
+"""Input normalization: canonical video IDs and channel handles for whole sheet columns at once.
+
+Every link form (watch?v=, youtu.be/, shorts/, embed/, live/, with or without &t= and
+other parameters) maps to one video ID, and every channel form (@handle, channel URL,
+/c/ and /user/ names, bare channel IDs) maps to one canonical handle, so duplicates
+are dropped before any API call or download. Legacy /user/ names and /c/ custom names
+are separate namespaces from @handles and keep their kind ("user:name", "c:name").
+"""
+from urllib.parse import unquote
+
+import pandas as pd
+
+# Video ID of a watch?v=, youtu.be/, shorts/, embed/, live/ or v/ link, or a bare 11-character ID
+VIDEO_ID_PATTERN = r"(?:^|[?&#]v=|youtu\.be/|/(?:shorts|embed|live|v|e)/)([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])"
+# Kind ("c", "user" or none) and name or ID of a youtube.com/@handle, /channel/UC..., /c/name or /user/name link
+CHANNEL_URL_PATTERN = r"youtube\.com/(?:(c|user)/|channel/|@)([^/?&#\s]+)"
+# Kind and name of an already canonical "c:name" or "user:name" handle
+CHANNEL_KIND_PATTERN = r"^(c|user):([^:]+)$"
+CHANNEL_ID_PATTERN = r"UC[0-9A-Za-z_-]{22}"
+INVALID_HANDLE_PATTERN = r"[/\s?&#:]"
+
+# Function to build the canonical watch URL of a video
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+# Function to extract the video IDs of a whole column of links (NA where a link has no ID)
+def extract_video_ids(urls):
+    urls = pd.Series(list(urls), dtype="string").str.strip()
+    return urls.str.extract(VIDEO_ID_PATTERN, expand=False)
+
+# Function to turn a column of links into unique video IDs, in first-seen order
+# Returns (video_ids, invalid links)
+def normalize_video_links(urls):
+    urls = pd.Series(list(urls), dtype="string")
+    video_ids = extract_video_ids(urls)
+    invalid = urls[video_ids.isna() & urls.notna()].tolist()
+    unique_ids = video_ids.dropna().drop_duplicates().tolist()
+    return unique_ids, invalid
+
+# Function to canonicalize a whole column of channel handles, links and IDs
+# Names become "@name", /user/ and /c/ names "user:name" and "c:name", and channel IDs stay "UC..."
+# NA where a value cannot be a channel
+def canonical_handles(values):
+    values = pd.Series(list(values), dtype="string").str.strip()
+    links = values.str.extract(CHANNEL_URL_PATTERN).astype("string")
+    canonical = values.str.extract(CHANNEL_KIND_PATTERN).astype("string")
+    kinds = links[0].where(links[1].notna(), canonical[0])
+    names = links[1].fillna(canonical[1]).map(unquote, na_action="ignore").astype("string")
+    names = names.fillna(values).str.lstrip("@")
+    is_channel_id = (names.str.fullmatch(CHANNEL_ID_PATTERN).fillna(False) & kinds.isna()).astype(bool)
+    handles = names.where(is_channel_id, "@" + names)
+    handles = handles.where(kinds.isna(), kinds + ":" + names)
+    return handles.where((names.str.len() > 0) & ~names.str.contains(INVALID_HANDLE_PATTERN).fillna(True))
+
+# Function to turn a column of handles into unique canonical handles, in first-seen order
+# Handles differing only in case are the same channel; the first spelling is kept
+# "@name", "user:name" and "c:name" are different channels even with the same name
+# Returns (handles, invalid values)
+def normalize_handles(values):
+    values = pd.Series(list(values), dtype="string")
+    handles = canonical_handles(values)
+    invalid = values[handles.isna() & values.notna()].tolist()
+    keys = handles.where(handles.str.startswith("UC").fillna(False).astype(bool), handles.str.lower())
+    unique_handles = handles[keys.notna() & ~keys.duplicated()].tolist()
+    return unique_handles, invalid
@@ -0,0 +1,89 @@
+"""Structured logging: size-rotated JSONL files tagged with the current run ID, and a bounded tail reader."""
+import datetime
+import json
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+log_file_name = "log.jsonl"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Roll over to log.jsonl.1 at this size
+LOG_BACKUPS = 5  # Rotated files kept next to the live one (log.jsonl.1 ... log.jsonl.5)
+TAIL_BLOCK_BYTES = 64 * 1024  # Read size when scanning a log file backwards
+
+current_run_id = None  # Run ID stamped on every record, see set_run_id()
+
+# Function to tag the following log records with a run ID (eg. the result store run of a stage)
+def set_run_id(run_id):
+    global current_run_id
+    current_run_id = run_id
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "run_id": current_run_id,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+# Function to send log records to a rotating JSONL file (safe to call again on every Streamlit rerun)
+def setup_logging(path=log_file_name, level=logging.INFO, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+    root = logging.getLogger()
+    root.setLevel(level)
+    path = os.path.abspath(path)
+    if any(getattr(handler, "baseFilename", None) == path for handler in root.handlers):
+        return
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(JsonFormatter())
+    root.addHandler(handler)
+
+# Function to yield the lines of a file from last to first, reading fixed-size blocks from the end
+def read_lines_reversed(path, block_size=TAIL_BLOCK_BYTES):
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            remainder = lines.pop(0)  # May be cut in half, completed by the next block
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+# Function to read the newest `limit` records of a log and its rotated files, optionally filtered
+# Only the end of the files is read, so the cost does not grow with the size of the log
+# Returns the records oldest first
+def tail_records(path=log_file_name, limit=200, run_id=None, min_level=None):
+    min_levelno = logging.getLevelName(min_level) if min_level else 0
+    records = []
+    for file_path in [path] + [f"{path}.{i}" for i in range(1, LOG_BACKUPS + 1)]:
+        if not os.path.exists(file_path):
+            continue
+        for line in read_lines_reversed(file_path):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Lines of the old plain-text log or a half-written line
+            if run_id and record.get("run_id") != run_id:
+                continue
+            if min_levelno and logging.getLevelName(record.get("level", "INFO")) < min_levelno:
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                return records[::-1]
+    return records[::-1]
+
+# Function to list the run IDs seen in the newest `scan` records, newest first
+def recent_run_ids(path=log_file_name, scan=5000):
+    run_ids = [record["run_id"] for record in reversed(tail_records(path, limit=scan)) if record.get("run_id")]
+    return list(dict.fromkeys(run_ids))
@@ -0,0 +1,147 @@
+"""In-process metrics: counters, latency histograms and stage timers, exported as JSON or OpenMetrics text."""
+import json
+import math
+import threading
+import time
+from contextlib import ContextDecorator
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Seconds (upper bounds)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)  # Seconds, up to long downloads
+
+class Histogram:
+    """Cumulative bucket counts plus count, sum and max of the observed values."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.bucket_counts[i] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th value (inf when it is above the last bucket)."""
+        rank = math.ceil(q * self.count)
+        for upper_bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            if bucket_count >= rank:
+                return upper_bound
+        return math.inf
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(upper_bound) for upper_bound in self.buckets], self.bucket_counts)),
+        }
+
+class MetricsRegistry:
+    """Thread-safe store of counters and histograms, keyed by metric name and labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    @staticmethod
+    def make_key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.make_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self.make_key(name, labels)
+        with self.lock:
+            self.histograms.setdefault(key, Histogram(buckets)).observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Returns {"counters": [...], "histograms": [...]}, one entry per name and label set."""
+        with self.lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    dict(histogram.snapshot(), name=name, labels=dict(labels))
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def to_openmetrics(self):
+        lines = []
+        snapshot = self.snapshot()
+        for name in sorted({counter["name"] for counter in snapshot["counters"]}):
+            lines.append(f"# TYPE {name} counter")
+            for counter in snapshot["counters"]:
+                if counter["name"] == name:
+                    lines.append(f"{name}_total{format_labels(counter['labels'])} {counter['value']}")
+        for name in sorted({histogram["name"] for histogram in snapshot["histograms"]}):
+            lines.append(f"# TYPE {name} histogram")
+            for histogram in snapshot["histograms"]:
+                if histogram["name"] != name:
+                    continue
+                for upper_bound, bucket_count in histogram["buckets"].items():
+                    lines.append(f"{name}_bucket{format_labels(dict(histogram['labels'], le=upper_bound))} {bucket_count}")
+                lines.append(f"{name}_bucket{format_labels(dict(histogram['labels'], le='+Inf'))} {histogram['count']}")
+                lines.append(f"{name}_count{format_labels(histogram['labels'])} {histogram['count']}")
+                lines.append(f"{name}_sum{format_labels(histogram['labels'])} {histogram['sum']}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics as OpenMetrics text when path ends in .prom or .txt, otherwise as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_openmetrics())
+            else:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=1)
+
+# Function to render a label set as {key="value",...}
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+registry = MetricsRegistry()  # Process-wide registry shared by all stages
+
+class StageTimer(ContextDecorator):
+    """Times one pipeline stage (api_fetch, download, split, transcribe, excel_write, ...).
+
+    Records flux_stage_seconds{stage} and, when the stage raises, flux_stage_errors{stage}.
+    Works as `with StageTimer("split"):` and as a `@StageTimer("split")` function decorator.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.started_at = None
+
+    def _recreate_cm(self):
+        return StageTimer(self.stage)  # A fresh timer per call, so decorated functions are thread-safe
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe("flux_stage_seconds", time.perf_counter() - self.started_at, buckets=STAGE_BUCKETS, stage=self.stage)
+        if exc_type is not None:
+            registry.inc("flux_stage_errors", stage=self.stage)
+        return False
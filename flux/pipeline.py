@@ -0,0 +1,345 @@
+"""Pipeline stages shared by the Streamlit page and the command line.
+
+Every stage reads and writes the same files in save_folder, so stages can be run
+one at a time (one Streamlit button each) or back to back with run_pipeline().
+"""
+import logging
+import os
+
+import pandas as pd
+
+from flux.download import DownloadManifest, TitleManifest, artifact_path, download_manifest_name, run_download_jobs, title_manifest_name
+from flux.index import get_artifact_index, link_artifact
+from flux.inputs import normalize_handles, normalize_video_links, video_url
+from flux.logs import set_run_id
+from flux.metrics import registry
+from flux.schema import CHANNEL_FIELDS, VIDEO_FIELDS, apply_dtypes, excel_converters
+from flux.store import ResultStore, TRANSCRIPT_COLUMN_WIDTHS, export_to_excel, result_store_name, write_excel
+from flux.transcribe import TranscriptCache, transcribe_files, transcript_cache_folder_name
+from flux.youtube import (
+    chunked,
+    ensure_quota,
+    estimate_quota,
+    get_channels_details,
+    get_videos_details,
+    list_playlist_videos,
+)
+
+channel_data_name = "01_YouTube_Channel_Data.xlsx"
+video_data_name = "02_YouTube_Video_Data.xlsx"
+# Stage timings and counters of this process, rewritten after every stage
+metrics_json_name = "00_Metrics.json"
+metrics_openmetrics_name = "00_Metrics.prom"
+# Column order of the exported sheets
+CHANNEL_COLUMNS = ["Handle"] + [field.column for field in CHANNEL_FIELDS]
+VIDEO_COLUMNS = ["Handle Name"] + [field.column for field in VIDEO_FIELDS] + ["Video URL"]
+
+# Function to write the collected metrics next to the results, as JSON and as OpenMetrics text
+def save_metrics(save_folder):
+    registry.write(os.path.join(save_folder, metrics_json_name))
+    registry.write(os.path.join(save_folder, metrics_openmetrics_name))
+
+# Function to pick the rows of (video_id, video_url) links from a get_videos_details frame, in link order
+# The original link is kept in a "Video URL" column; links to unknown videos are dropped
+def video_rows_for_links(video_frame, video_links):
+    found = [(video_id, video_url) for video_id, video_url in video_links if video_id in video_frame.index]
+    return video_frame.loc[[video_id for video_id, _ in found]].assign(**{"Video URL": [video_url for _, video_url in found]})
+
+# Function to store video rows, record their titles in the artifact index
+# and keep the ID -> title sidecar of the save folder's ID-named files up to date
+def store_video_rows(result_store_path, result_store, run_id, video_data):
+    result_store.append_frame("videos", run_id, video_data)
+    titles = dict(zip(video_data["Video ID"], video_data["Video Title"].to_numpy(dtype=object, na_value=None)))
+    get_artifact_index().record_videos(titles)
+    TitleManifest(os.path.join(os.path.dirname(result_store_path), title_manifest_name)).update(titles)
+
+# Function to export one stored channel run to Excel, with typed cells
+def export_channels(result_store, excel_path, run_id):
+    export_to_excel(result_store, "channels", excel_path, run_id, columns=CHANNEL_COLUMNS, converters=excel_converters(CHANNEL_FIELDS))
+
+# Function to export one stored video run to Excel, with typed cells
+def export_videos(result_store, excel_path, run_id):
+    export_to_excel(result_store, "videos", excel_path, run_id, columns=VIDEO_COLUMNS, converters=excel_converters(VIDEO_FIELDS))
+
+# Function to load one stored run (the latest by default) as a typed DataFrame for analysis
+def load_results(save_folder, table, run_id=None):
+    result_store = ResultStore(os.path.join(save_folder, result_store_name))
+    run_id = run_id or result_store.latest_run(table)
+    if not run_id:
+        return pd.DataFrame()
+    fields = {"channels": CHANNEL_FIELDS, "videos": VIDEO_FIELDS}.get(table, [])
+    return apply_dtypes(result_store.read_frame(table, run_id), fields)
+
+# Function to scrape channel information for a list of handles into 01_YouTube_Channel_Data.xlsx
+# Raises QuotaExceededError before the first call when the run does not fit in today's quota
+# Handles are canonicalized and de-duplicated first; values that cannot be a handle count as not found
+def scrape_channels(handles, save_folder, on_not_found=None):
+    handles, invalid = normalize_handles(handles)
+    logging.info(f"{len(handles)} unique channels, {len(invalid)} invalid handles")
+    ensure_quota(estimate_quota(handles=handles))
+    result_store_path = os.path.join(save_folder, result_store_name)
+    result_store = ResultStore(result_store_path)
+    run_id = result_store.new_run()
+    set_run_id(run_id)
+
+    for handle in invalid:
+        logging.warning(f"Not a channel handle: {handle}")
+        if on_not_found:
+            on_not_found(handle)
+    # Rows are stored batch by batch so a crash keeps everything fetched so far
+    for handle_batch in chunked(handles):
+        channel_frame, not_found = get_channels_details(handle_batch)
+        result_store.append_frame("channels", run_id, channel_frame)
+        get_artifact_index().record_channels(dict(zip(channel_frame["Handle"], channel_frame["Channel ID"])))
+        for handle in not_found:
+            logging.warning(f"Channel not found for handle: {handle}")
+            if on_not_found:
+                on_not_found(handle)
+
+    channel_data_path = os.path.join(save_folder, channel_data_name)
+    export_channels(result_store, channel_data_path, run_id)
+    save_metrics(save_folder)
+    return channel_data_path
+
+# Function to scrape video information for a list of links into 02_YouTube_Video_Data.xlsx
+# Raises QuotaExceededError before the first call when the run does not fit in today's quota
+# Links are canonicalized first, so every video is fetched once however often and in whatever form it is listed
+def scrape_videos(video_urls, save_folder, on_invalid_link=None):
+    video_ids, invalid = normalize_video_links(video_urls)
+    logging.info(f"{len(video_ids)} unique videos, {len(invalid)} invalid links")
+    for invalid_url in invalid:
+        logging.warning(f"No video ID in link: {invalid_url}")
+        if on_invalid_link:
+            on_invalid_link(invalid_url)
+    ensure_quota(estimate_quota(video_ids=video_ids))
+
+    result_store_path = os.path.join(save_folder, result_store_name)
+    result_store = ResultStore(result_store_path)
+    run_id = result_store.new_run()
+    set_run_id(run_id)
+
+    # Fetch videos in 50-ID batches and store each batch as soon as it arrives
+    for id_batch in chunked(video_ids):
+        video_frame = get_videos_details(id_batch)
+        store_video_rows(result_store_path, result_store, run_id, video_rows_for_links(video_frame, [(video_id, video_url(video_id)) for video_id in id_batch]))
+
+    video_data_path = os.path.join(save_folder, video_data_name)
+    export_videos(result_store, video_data_path, run_id)
+    save_metrics(save_folder)
+    return video_data_path
+
+# Function to read (Channel ID, Uploads Playlist ID) pairs from the latest stored channel scrape
+def read_stored_channels(save_folder):
+    result_store = ResultStore(os.path.join(save_folder, result_store_name))
+    run_id = result_store.latest_run("channels")
+    if not run_id:
+        return []
+    columns, cursor = result_store.iter_rows("channels", run_id)
+    channels = {}
+    for row in cursor:
+        row = dict(zip(columns, row))
+        channels[row["Channel ID"]] = row.get("Uploads Playlist ID")
+    return list(channels.items())
+
+# Function to crawl the uploads playlists of channels into 02_YouTube_Video_Data.xlsx
+# Only uploads newer than the last crawl of each channel are fetched; returns (video_data_path, new video count)
+# The sheet is only rewritten when there are new uploads
+def crawl_channel_uploads(save_folder, channels=None, on_channel_done=None):
+    result_store_path = os.path.join(save_folder, result_store_name)
+    result_store = ResultStore(result_store_path)
+    run_id = result_store.new_run()
+    set_run_id(run_id)
+    channels = channels if channels is not None else read_stored_channels(save_folder)
+    ensure_quota(estimate_quota(playlists=len(channels)))
+
+    new_videos = 0
+    for channel_id, playlist_id in channels:
+        if not playlist_id or playlist_id == "N/A":
+            playlist_id = f"UU{channel_id[2:]}"  # Uploads playlist ID derived from the channel ID
+        newest_video_id, newest_published_at = result_store.get_sync_state(channel_id)
+        uploads, complete = list_playlist_videos(playlist_id, stop_at_video_id=newest_video_id, published_after=newest_published_at)
+
+        # New IDs go straight into the batched videos.list fetch
+        for upload_batch in chunked(uploads):
+            video_frame = get_videos_details([video_id for video_id, _ in upload_batch])
+            video_data = video_rows_for_links(video_frame, [(video_id, video_url(video_id)) for video_id, _ in upload_batch])
+            store_video_rows(result_store_path, result_store, run_id, video_data)
+            new_videos += len(video_data)
+
+        # The sync state only moves after a complete listing, otherwise the uploads never fetched would be skipped for good
+        if uploads and complete:
+            result_store.set_sync_state(channel_id, playlist_id, *uploads[0])
+        elif not complete:
+            logging.warning(f"Uploads of {channel_id} listed only partly, the next crawl lists them again")
+        logging.info(f"Crawled {channel_id}: {len(uploads)} new uploads")
+        if on_channel_done:
+            on_channel_done(channel_id, len(uploads))
+
+    # A crawl without new uploads leaves the previous video sheet (eg. from Step 3) in place for Step 4
+    video_data_path = os.path.join(save_folder, video_data_name)
+    if new_videos:
+        export_videos(result_store, video_data_path, run_id)
+    save_metrics(save_folder)
+    return video_data_path, new_videos
+
+# Function to read the Video IDs of the last video scrape
+def read_video_ids(save_folder):
+    video_df = pd.read_excel(os.path.join(save_folder, video_data_name))
+    if "Video ID" not in video_df.columns:
+        return []  # Empty sheet, eg. a crawl that found no new uploads
+    return video_df["Video ID"].dropna().astype(str).drop_duplicates().tolist()
+
+# Function to mark download jobs done with files the artifact index already knows (from any run or save folder)
+# Files from another folder are hard-linked (or copied) in; returns the IDs resolved locally
+def reuse_indexed_downloads(manifest, video_ids, video_folder, audio_folder, audio_only):
+    reused = []
+    for video_id, row in get_artifact_index().lookup(video_ids).items():
+        if manifest.is_done(video_id, audio_only) or not row["audio_path"] or not (audio_only or row["video_path"]):
+            continue
+        files = [link_artifact(row["audio_path"], artifact_path(audio_folder, video_id, "mp3"))]
+        if not audio_only:
+            video_ext = os.path.splitext(row["video_path"])[1].lstrip(".")
+            files.insert(0, link_artifact(row["video_path"], artifact_path(video_folder, video_id, video_ext)))
+        manifest.update(video_id, status="done", error=None, files=files)
+        reused.append(video_id)
+    return reused
+
+# Function to record the files of finished download jobs in the artifact index
+def index_downloads(manifest, video_ids):
+    for video_id in video_ids:
+        job = manifest.jobs.get(video_id)
+        if job and job["status"] == "done" and job["files"]:
+            get_artifact_index().record_files(video_id, **{"audio_path" if path.endswith(".mp3") else "video_path": path for path in job["files"]})
+
+# Function to download MP4 and MP3 (or MP3 only) for a list of videos into save_folder/Video and save_folder/Audio
+# Returns the job counts of these videos in the download manifest
+def download_videos(save_folder, video_ids, audio_only=False, on_progress=None):
+    set_run_id(ResultStore.new_run())
+    video_ids = list(dict.fromkeys(video_ids))
+    youtube_links = [video_url(video_id) for video_id in video_ids]
+    video_folder = os.path.join(save_folder, "Video")
+    audio_folder = os.path.join(save_folder, "Audio")
+    os.makedirs(video_folder, exist_ok=True)
+    os.makedirs(audio_folder, exist_ok=True)
+
+    # Job state lives next to the video sheet so reruns skip finished items and resume the rest
+    manifest = DownloadManifest(os.path.join(save_folder, download_manifest_name))
+    manifest.add_jobs(dict(zip(video_ids, youtube_links)))
+    reused = reuse_indexed_downloads(manifest, video_ids, video_folder, audio_folder, audio_only)
+
+    logging.info(f"Downloading {len(youtube_links) - len(reused)} videos, {len(reused)} already on disk (audio only: {audio_only})")
+    counts = run_download_jobs(manifest, video_folder, audio_folder, audio_only=audio_only, on_progress=on_progress, video_ids=video_ids)
+    index_downloads(manifest, video_ids)
+    save_metrics(save_folder)
+    return counts
+
+# Function to get the timestamped (Excel) and plain (TXT) transcript paths of an audio file
+# They are sharded like the audio (Transcript/ab/abcdefghijk_transcript.txt); the shard folder is created here
+def transcript_output_paths(save_folder, file_path):
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    excel_file_path = os.path.join(save_folder, "Time Stamp Transcript", base_name[:2], f"{base_name}_timestamp_transcript.xlsx")
+    text_file_path = os.path.join(save_folder, "Transcript", base_name[:2], f"{base_name}_transcript.txt")
+    os.makedirs(os.path.dirname(excel_file_path), exist_ok=True)
+    os.makedirs(os.path.dirname(text_file_path), exist_ok=True)
+    return excel_file_path, text_file_path
+
+# Function to list the MP3s of an audio folder: the ID shards (Audio/ab/*.mp3) plus files placed at the top level
+def list_audio_files(audio_folder):
+    mp3_paths = []
+    for entry in os.scandir(audio_folder):
+        if entry.is_dir():
+            mp3_paths += [shard_entry.path for shard_entry in os.scandir(entry.path) if shard_entry.name.endswith(".mp3")]
+        elif entry.name.endswith(".mp3"):
+            mp3_paths.append(entry.path)
+    return sorted(mp3_paths)
+
+# Function to store the transcript rows of one file and write its Excel and TXT outputs
+def write_transcript_outputs(result_store, run_id, file_path, data, excel_file_path, text_file_path):
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    transcript_rows = [
+        {"Source": base_name, "Start Time": start_time, "End Time": end_time, "Text": text}
+        for start_time, end_time, text in data
+    ]
+    result_store.append("transcripts", run_id, transcript_rows)
+
+    # Save timestamped transcript as an Excel file, column widths included
+    # Written from the rows at hand: reading them back from the store would scan the whole run once per file
+    write_excel(excel_file_path, list(TRANSCRIPT_COLUMN_WIDTHS), data, TRANSCRIPT_COLUMN_WIDTHS)
+
+    # プレーンテキストの文字起こしをテキストファイルとして保存
+    with open(text_file_path, "w", encoding="utf-8") as txt_file:
+        for _, _, text in data:
+            txt_file.write(text + "\n")
+
+# Function to record the transcripts of an audio file in the artifact index (when the file belongs to a known video)
+def index_transcripts(file_path, excel_file_path, text_file_path):
+    video_id = get_artifact_index().find_video_id("audio_path", file_path)
+    if video_id:
+        get_artifact_index().record_files(video_id, transcript_path=text_file_path, timestamp_transcript_path=excel_file_path)
+
+# Function to transcribe every MP3 in save_folder/Audio into plain and timestamped transcripts
+# on_file_done(file_path, excel_file_path, text_file_path, errors) is called as each file finishes
+# With trim_silence, long pauses are cut before upload and the timestamps mapped back to the original audio
+def transcribe_audio_folder(save_folder, on_file_done=None, trim_silence=False):
+    audio_folder = os.path.join(save_folder, "Audio")
+    transcript_folder = os.path.join(save_folder, "Transcript")
+    timestamp_transcript_folder = os.path.join(save_folder, "Time Stamp Transcript")
+    os.makedirs(transcript_folder, exist_ok=True)
+    os.makedirs(timestamp_transcript_folder, exist_ok=True)
+
+    mp3_paths = list_audio_files(audio_folder)
+    logging.info(f"Transcribing {len(mp3_paths)} audio files")
+
+    transcript_cache = TranscriptCache(os.path.join(save_folder, transcript_cache_folder_name))
+    result_store = ResultStore(os.path.join(save_folder, result_store_name))
+    run_id = result_store.new_run()
+    set_run_id(run_id)
+    for file_path, data, errors, from_cache in transcribe_files(mp3_paths, cache=transcript_cache, trim_silence=trim_silence):
+        for chunk_file, e in errors:
+            logging.error(f"Transcription failed for {chunk_file}: {e}")
+
+        excel_file_path, text_file_path = transcript_output_paths(save_folder, file_path)
+
+        # Outputs of cached files are only regenerated when they are missing
+        if from_cache and os.path.exists(excel_file_path) and os.path.exists(text_file_path):
+            continue
+        write_transcript_outputs(result_store, run_id, file_path, data, excel_file_path, text_file_path)
+        index_transcripts(file_path, excel_file_path, text_file_path)
+
+        if on_file_done:
+            on_file_done(file_path, excel_file_path, text_file_path, errors)
+
+    save_metrics(save_folder)
+    return transcript_folder, timestamp_transcript_folder
+
+# Function to re-export the latest stored channel and video runs to Excel
+# Returns [(excel_path, run_id)] for every table that has data
+def export_latest_results(save_folder):
+    result_store = ResultStore(os.path.join(save_folder, result_store_name))
+    exported = []
+    for table, excel_name, export in [("channels", channel_data_name, export_channels), ("videos", video_data_name, export_videos)]:
+        run_id = result_store.latest_run(table)
+        if run_id:
+            excel_path = os.path.join(save_folder, excel_name)
+            export(result_store, excel_path, run_id)
+            exported.append((excel_path, run_id))
+    return exported
+
+# Function to run the stages back to back: channels, videos, downloads, transcripts
+# A stage whose input is missing (no video sheet to download, no Audio folder to transcribe) is skipped with a warning
+def run_pipeline(save_folder, handles=(), video_urls=(), download=True, transcribe=True, audio_only=False, trim_silence=False):
+    os.makedirs(save_folder, exist_ok=True)
+    if handles:
+        logging.info(f"Channel data saved to {scrape_channels(handles, save_folder)}")
+    if video_urls:
+        logging.info(f"Video data saved to {scrape_videos(video_urls, save_folder)}")
+    if download and not os.path.exists(os.path.join(save_folder, video_data_name)):
+        logging.warning(f"Downloads skipped: no {video_data_name} in {save_folder} (pass video links to create it)")
+    elif download:
+        counts = download_videos(save_folder, read_video_ids(save_folder), audio_only=audio_only)
+        logging.info(f"Downloads: {counts}")
+    if transcribe and not os.path.isdir(os.path.join(save_folder, "Audio")):
+        logging.warning(f"Transcription skipped: no Audio folder in {save_folder} (download the videos first)")
+    elif transcribe:
+        transcript_folder, timestamp_transcript_folder = transcribe_audio_folder(save_folder, trim_silence=trim_silence)
+        logging.info(f"Transcripts saved to {transcript_folder} and {timestamp_transcript_folder}")
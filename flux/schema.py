@@ -0,0 +1,166 @@
+"""Declarative field schemas that flatten API items into typed DataFrames in bulk.
+
+Each Field maps a result column to a path inside the raw API item and a kind:
+    string    free text
+    category  repeated values (languages, statuses, ...), stored as pandas categoricals
+    int       counts, as nullable int64
+    bool      "true"/"false" or JSON booleans, as nullable booleans
+    datetime  ISO-8601 timestamps, as UTC datetimes
+    duration  ISO-8601 durations (PT1H2M3S), as nullable int64 seconds
+    list      lists of strings, joined with ", "
+    localizations  {lang: {title, description}} maps, one "lang: title - description" line per language
+Missing values stay missing (NA) instead of being filled with "N/A".
+"""
+import datetime
+from collections import namedtuple
+
+import pandas as pd
+
+Field = namedtuple("Field", ["column", "path", "kind"])
+
+VIDEO_FIELDS = [
+    Field("Channel ID", ("snippet", "channelId"), "string"),
+    Field("Video ID", ("id",), "string"),
+    Field("Video Title", ("snippet", "title"), "string"),
+    Field("Video Description", ("snippet", "description"), "string"),
+    Field("Published Date", ("snippet", "publishedAt"), "datetime"),
+    Field("Channel Name", ("snippet", "channelTitle"), "category"),
+    Field("Category ID", ("snippet", "categoryId"), "category"),
+    Field("Tags", ("snippet", "tags"), "list"),
+    Field("Default Language", ("snippet", "defaultLanguage"), "category"),
+    Field("Audio Language", ("snippet", "defaultAudioLanguage"), "category"),
+    Field("Thumbnail URL", ("snippet", "thumbnails", "high", "url"), "string"),
+    Field("View Count", ("statistics", "viewCount"), "int"),
+    Field("Like Count", ("statistics", "likeCount"), "int"),
+    Field("Comment Count", ("statistics", "commentCount"), "int"),
+    Field("Video Duration (s)", ("contentDetails", "duration"), "duration"),
+    Field("Video Quality", ("contentDetails", "definition"), "category"),
+    Field("3D or 2D", ("contentDetails", "dimension"), "category"),
+    Field("Captions Available", ("contentDetails", "caption"), "bool"),
+    Field("Licensed Content", ("contentDetails", "licensedContent"), "bool"),
+    Field("Projection Type", ("contentDetails", "projection"), "category"),
+    Field("Embed HTML", ("player", "embedHtml"), "string"),
+    Field("Privacy Status", ("status", "privacyStatus"), "category"),
+    Field("Upload Status", ("status", "uploadStatus"), "category"),
+    Field("Embeddable", ("status", "embeddable"), "bool"),
+    Field("Public Stats Viewable", ("status", "publicStatsViewable"), "bool"),
+    Field("Topic IDs", ("topicDetails", "topicIds"), "list"),
+    Field("Relevant Topic IDs", ("topicDetails", "relevantTopicIds"), "list"),
+    Field("Topic Categories", ("topicDetails", "topicCategories"), "list"),
+    Field("Recording Date", ("recordingDetails", "recordingDate"), "datetime"),
+    Field("Live Start Time", ("liveStreamingDetails", "actualStartTime"), "datetime"),
+    Field("Live End Time", ("liveStreamingDetails", "actualEndTime"), "datetime"),
+    Field("Scheduled Live Start", ("liveStreamingDetails", "scheduledStartTime"), "datetime"),
+    Field("Scheduled Live End", ("liveStreamingDetails", "scheduledEndTime"), "datetime"),
+    Field("Concurrent Viewers", ("liveStreamingDetails", "concurrentViewers"), "int"),
+    Field("Live Chat ID", ("liveStreamingDetails", "activeLiveChatId"), "string"),
+]
+
+CHANNEL_FIELDS = [
+    Field("Channel ID", ("id",), "string"),
+    Field("Channel Title", ("snippet", "title"), "string"),
+    Field("Channel Description", ("snippet", "description"), "string"),
+    Field("Published Date", ("snippet", "publishedAt"), "datetime"),
+    Field("Country", ("snippet", "country"), "category"),
+    Field("Subscribers", ("statistics", "subscriberCount"), "int"),
+    Field("Total Views", ("statistics", "viewCount"), "int"),
+    Field("Total Videos", ("statistics", "videoCount"), "int"),
+    Field("Custom URL", ("snippet", "customUrl"), "string"),
+    Field("Channel Keywords", ("brandingSettings", "channel", "keywords"), "string"),
+    Field("Analytics Tracking ID", ("brandingSettings", "channel", "trackingAnalyticsAccountId"), "string"),
+    Field("Trailer Video (Non-Subscribers)", ("brandingSettings", "channel", "unsubscribedTrailer"), "string"),
+    Field("Default Language", ("brandingSettings", "channel", "defaultLanguage"), "category"),
+    Field("Banner Image URL", ("brandingSettings", "image", "bannerExternalUrl"), "string"),
+    Field("Uploads Playlist ID", ("contentDetails", "relatedPlaylists", "uploads"), "string"),
+    Field("Likes Playlist ID", ("contentDetails", "relatedPlaylists", "likes"), "string"),
+    Field("Favorites Playlist ID", ("contentDetails", "relatedPlaylists", "favorites"), "string"),
+    Field("Watch Later Playlist ID", ("contentDetails", "relatedPlaylists", "watchLater"), "string"),
+    Field("Topic IDs", ("topicDetails", "topicIds"), "list"),
+    Field("Relevant Topic IDs", ("topicDetails", "relevantTopicIds"), "list"),
+    Field("Localization Info", ("localizations",), "localizations"),
+    Field("Content Owner", ("contentOwnerDetails", "contentOwner"), "string"),
+    Field("Time Linked to Content Owner", ("contentOwnerDetails", "timeLinked"), "datetime"),
+    Field("Privacy Status", ("status", "privacyStatus"), "category"),
+    Field("Is Linked to Google Account", ("status", "isLinked"), "bool"),
+    Field("Long Uploads Status", ("status", "longUploadsStatus"), "category"),
+]
+
+# Weeks, days, hours, minutes, seconds of an ISO-8601 duration such as P1DT2H3M4S
+ISO_DURATION_PATTERN = r"^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$"
+ISO_DURATION_SECONDS = [7 * 86400, 86400, 3600, 60, 1]
+BOOL_VALUES = {True: True, False: False, "true": True, "false": False}
+
+# Function to pull one field out of every item
+# Intermediate objects (eg. every item's snippet) are looked up once and shared by all fields through `parents_cache`
+def extract_column(items, path, parents_cache):
+    parents = items
+    for depth in range(1, len(path)):
+        prefix = path[:depth]
+        if prefix not in parents_cache:
+            parents_cache[prefix] = [parent.get(path[depth - 1]) or {} for parent in parents]
+        parents = parents_cache[prefix]
+    return [parent.get(path[-1]) for parent in parents]
+
+# Function to convert ISO-8601 durations to whole seconds, for a whole column at once
+def parse_iso_durations(values):
+    values = pd.Series(values, dtype="string")
+    parts = values.str.extract(ISO_DURATION_PATTERN).astype("float64")
+    seconds = (parts.fillna(0) * ISO_DURATION_SECONDS).sum(axis=1)
+    return seconds.where(values.str.match(ISO_DURATION_PATTERN).fillna(False)).round().astype("Int64")
+
+# Function to convert a column of raw values to the dtype of its kind
+def convert_column(values, kind):
+    if kind == "int":
+        return pd.to_numeric(pd.Series(values, dtype="string"), errors="coerce").astype("Int64")
+    if kind == "duration":
+        return parse_iso_durations(values)
+    if kind == "datetime":
+        return pd.to_datetime(pd.Series(values, dtype="string"), utc=True, errors="coerce", format="ISO8601")
+    if kind == "bool":
+        return pd.Series(values, dtype="object").map(BOOL_VALUES).astype("boolean")
+    if kind == "category":
+        return pd.Series(values, dtype="category")
+    if kind == "list":
+        return pd.Series([", ".join(value) if value else None for value in values], dtype="string")
+    if kind == "localizations":
+        return pd.Series([
+            "\n".join(f"{lang}: {details.get('title', '')} - {details.get('description', '')}" for lang, details in value.items()) if value else None
+            for value in values
+        ], dtype="string")
+    return pd.Series(values, dtype="string")
+
+# Function to flatten a batch of raw API items into a typed DataFrame, one column per field
+def flatten_items(items, fields):
+    parents_cache = {}
+    return pd.DataFrame({
+        field.column: convert_column(extract_column(items, field.path, parents_cache), field.kind)
+        for field in fields
+    })
+
+# Function to re-apply the schema dtypes to a DataFrame read back from the result store
+def apply_dtypes(frame, fields):
+    for field in fields:
+        if field.column not in frame.columns:
+            continue
+        if field.kind == "datetime":
+            frame[field.column] = pd.to_datetime(frame[field.column], utc=True, errors="coerce", format="ISO8601")
+        elif field.kind in ("int", "duration"):
+            frame[field.column] = pd.to_numeric(frame[field.column], errors="coerce").astype("Int64")
+        elif field.kind == "bool":
+            frame[field.column] = frame[field.column].astype("boolean")
+        elif field.kind == "category":
+            frame[field.column] = frame[field.column].astype("category")
+        else:
+            frame[field.column] = frame[field.column].astype("string")
+    return frame
+
+# Function to get per-column converters that turn stored values back into Excel-native cells
+# (real dates instead of text, TRUE/FALSE instead of 1/0)
+def excel_converters(fields):
+    converters = {}
+    for field in fields:
+        if field.kind == "datetime":
+            converters[field.column] = lambda value: datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
+        elif field.kind == "bool":
+            converters[field.column] = lambda value: bool(value) if value is not None else None
+    return converters
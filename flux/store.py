@@ -0,0 +1,159 @@
+"""Append-only result store and streaming Excel export."""
+import random
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+from flux.metrics import StageTimer, registry
+
+result_store_name = "00_Results.sqlite3"
+TRANSCRIPT_COLUMN_WIDTHS = {"Start Time": 50 / 7, "End Time": 50 / 7, "Text": 500 / 7}
+
+class ResultStore:
+    """Append-only SQLite store for result rows; every run appends under its own run ID.
+
+    The channel_sync table is the one exception: it holds the newest known upload per channel
+    and is updated in place by the uploads crawler.
+    """
+
+    TABLES = ("channels", "videos", "transcripts")
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Rows already appended survive a crash mid-run
+
+    @staticmethod
+    def new_run():
+        """Returns a new run ID; it also tags the log records of the run (see flux.logs)."""
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{random.randrange(16 ** 4):04x}"
+
+    def columns(self, table):
+        return [row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def append(self, table, run_id, rows):
+        """Appends dict rows, adding columns the table has not seen yet."""
+        if not rows:
+            return
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        self.insert(table, run_id, columns, [[row.get(column) for column in columns] for row in rows])
+
+    def append_frame(self, table, run_id, frame):
+        """Appends the rows of a typed DataFrame (see flux.schema), column by column.
+
+        Datetimes are stored as "YYYY-MM-DD HH:MM:SS" UTC text, booleans as 1/0 and missing values as NULL.
+        """
+        if frame.empty:
+            return
+        columns = {}
+        for column in frame.columns:
+            values = frame[column]
+            if isinstance(values.dtype, pd.DatetimeTZDtype):
+                values = values.dt.tz_convert("UTC").dt.strftime("%Y-%m-%d %H:%M:%S")
+            columns[column] = values.to_numpy(dtype=object, na_value=None)
+        self.insert(table, run_id, list(columns), zip(*columns.values()))
+
+    def insert(self, table, run_id, columns, value_rows):
+        assert table in self.TABLES
+        with self.lock:
+            existing = self.columns(table)
+            if not existing:
+                self.conn.execute(f'CREATE TABLE "{table}" ("_run_id" TEXT)')
+                self.conn.execute(f'CREATE INDEX "{table}_run" ON "{table}" ("_run_id")')
+                existing = ["_run_id"]
+            for column in columns:
+                if column not in existing:
+                    self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+                    existing.append(column)
+            placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+            quoted = ", ".join(f'"{column}"' for column in ["_run_id", *columns])
+            self.conn.executemany(
+                f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders})',
+                ([run_id, *values] for values in value_rows),
+            )
+            self.conn.commit()
+
+    def get_sync_state(self, channel_id):
+        """Returns the newest known upload of a channel as (video_id, published_at), or (None, None)."""
+        with self.lock:
+            self.create_sync_table()
+            row = self.conn.execute(
+                "SELECT newest_video_id, newest_published_at FROM channel_sync WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def set_sync_state(self, channel_id, playlist_id, video_id, published_at):
+        with self.lock:
+            self.create_sync_table()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO channel_sync VALUES (?, ?, ?, ?, ?)",
+                (channel_id, playlist_id, video_id, published_at, time.time()),
+            )
+            self.conn.commit()
+
+    def create_sync_table(self):
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS channel_sync (channel_id TEXT PRIMARY KEY, playlist_id TEXT,"
+            " newest_video_id TEXT, newest_published_at TEXT, synced_at REAL)"
+        )
+
+    def read_frame(self, table, run_id):
+        """Returns the rows of one run as an (untyped) DataFrame; see flux.schema.apply_dtypes."""
+        columns, cursor = self.iter_rows(table, run_id)
+        return pd.DataFrame(list(cursor), columns=columns)
+
+    def latest_run(self, table):
+        if not self.columns(table):
+            return None
+        row = self.conn.execute(f'SELECT "_run_id" FROM "{table}" ORDER BY rowid DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def iter_rows(self, table, run_id, **filters):
+        """Returns (columns, cursor) for one run; columns starting with "_" are internal and left out."""
+        columns = [column for column in self.columns(table) if not column.startswith("_")]
+        if not columns:
+            return [], iter(())
+        where = " AND ".join(['"_run_id" = ?'] + [f'"{column}" = ?' for column in filters])
+        quoted = ", ".join(f'"{column}"' for column in columns)
+        cursor = self.conn.execute(
+            f'SELECT {quoted} FROM "{table}" WHERE {where} ORDER BY rowid', [run_id, *filters.values()]
+        )
+        return columns, cursor
+
+# Function to export stored rows to Excel with a streaming write-only workbook
+# converters maps a column to a function applied to each of its stored values (eg. text → datetime)
+def export_to_excel(store, table, excel_path, run_id, column_widths=None, columns=None, converters=None, **filters):
+    stored_columns, cursor = store.iter_rows(table, run_id, **filters)
+    columns = columns or stored_columns
+    positions = [stored_columns.index(column) if column in stored_columns else None for column in columns]
+    converters = [(i, converters[column]) for i, column in enumerate(columns) if converters and column in converters]
+
+    def rows():
+        for row in cursor:
+            values = [row[i] if i is not None else None for i in positions]
+            for i, convert in converters:
+                values[i] = convert(values[i])
+            yield values
+
+    write_excel(excel_path, columns, rows(), column_widths)
+
+# Function to write rows (sequences in the order of columns) to Excel with a write-only workbook
+# Column widths are set in the same pass, so the file never has to be reopened
+@StageTimer("excel_write")
+def write_excel(excel_path, columns, rows, column_widths=None):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for i, column in enumerate(columns, start=1):
+        if column_widths and column in column_widths:
+            ws.column_dimensions[get_column_letter(i)].width = column_widths[column]
+    ws.append(columns)
+    row_count = 0
+    for values in rows:
+        ws.append(values)
+        row_count += 1
+    wb.save(excel_path)
+    registry.inc("flux_excel_rows", row_count)
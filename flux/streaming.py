@@ -0,0 +1,217 @@
+"""Streaming pipeline: each video moves on to transcription as soon as its audio lands.
+
+Stages (metadata → download → preprocess and chunk → transcribe → write) run in their own threads
+and are connected by bounded queues. At most max_in_flight downloaded files wait
+for transcription at any time, so a slow API applies backpressure to the downloads
+instead of filling the disk.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from flux.audio import PREPROCESS_WORKERS, preprocess_variant
+from flux.download import DOWNLOAD_WORKERS, DOWNLOADS_PER_HOST, DownloadManifest, download_manifest_name, run_download_job
+from flux.inputs import normalize_video_links, video_url
+from flux.logs import set_run_id
+from flux.pipeline import (
+    export_videos,
+    index_downloads,
+    index_transcripts,
+    reuse_indexed_downloads,
+    save_metrics,
+    store_video_rows,
+    transcript_output_paths,
+    video_data_name,
+    video_rows_for_links,
+    write_transcript_outputs,
+)
+from flux.store import ResultStore, result_store_name
+from flux.transcribe import (
+    TRANSCRIBE_WORKERS,
+    TranscriptCache,
+    cached_transcript_rows,
+    lookup_cached_file,
+    prepare_job,
+    transcribe_chunk_cached,
+    transcript_cache_folder_name,
+)
+from flux.youtube import chunked, ensure_quota, estimate_quota, get_videos_details
+
+MAX_IN_FLIGHT = 8  # Downloaded files allowed to wait for transcription
+QUEUE_SIZE = 16  # Capacity of each queue between stages
+DONE = object()  # End-of-stream marker passed down the queues
+
+# Function to run every video through metadata, download, chunking, transcription and output writing as a stream
+# on_file_done(file_path, excel_file_path, text_file_path, errors) is called from the calling thread
+# Returns a summary with counts, time to first transcript and total makespan (seconds)
+# An error in the metadata stage (eg. QuotaExceededError) is re-raised after the videos already queued are finished
+def run_streaming_pipeline(save_folder, video_urls, audio_only=True, download_workers=DOWNLOAD_WORKERS,
+                           transcribe_workers=TRANSCRIBE_WORKERS, max_in_flight=MAX_IN_FLIGHT, on_file_done=None,
+                           trim_silence=False, preprocess_workers=PREPROCESS_WORKERS):
+    started_at = time.monotonic()
+    video_ids, invalid = normalize_video_links(video_urls)
+    for invalid_url in invalid:
+        logging.warning(f"No video ID in link: {invalid_url}")
+    ensure_quota(estimate_quota(video_ids=video_ids))
+    video_folder = os.path.join(save_folder, "Video")
+    audio_folder = os.path.join(save_folder, "Audio")
+    for folder in (video_folder, audio_folder, os.path.join(save_folder, "Transcript"), os.path.join(save_folder, "Time Stamp Transcript")):
+        os.makedirs(folder, exist_ok=True)
+
+    result_store_path = os.path.join(save_folder, result_store_name)
+    result_store = ResultStore(result_store_path)
+    run_id = result_store.new_run()
+    set_run_id(run_id)
+    manifest = DownloadManifest(os.path.join(save_folder, download_manifest_name))
+    transcript_cache = TranscriptCache(os.path.join(save_folder, transcript_cache_folder_name))
+    variant = preprocess_variant(trim_silence)
+
+    download_queue = queue.Queue(QUEUE_SIZE)
+    chunk_queue = queue.Queue(QUEUE_SIZE)
+    transcribe_queue = queue.Queue(QUEUE_SIZE)
+    write_queue = queue.Queue()
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    host_limits = {}
+    summary = {"videos": 0, "downloaded": 0, "download_failed": 0, "transcribed": 0, "time_to_first_transcript": None}
+    summary_lock = threading.Lock()
+    failures = []  # Exception that stopped the metadata stage, re-raised once the other stages have drained
+
+    def count(key):
+        with summary_lock:
+            summary[key] += 1
+
+    # Every stage passes DONE on in a finally block, so a crash in one stage cannot hang the others
+    def metadata_stage():
+        try:
+            # Each 50-ID batch is handed to the downloaders as soon as its details arrive
+            # Videos the artifact index already has on disk skip the download
+            for id_batch in chunked(video_ids):
+                video_frame = get_videos_details(id_batch)
+                video_data = video_rows_for_links(video_frame, [(video_id, video_url(video_id)) for video_id in id_batch])
+                store_video_rows(result_store_path, result_store, run_id, video_data)
+                manifest.add_jobs({video_id: video_url(video_id) for video_id in video_data["Video ID"]})
+                reuse_indexed_downloads(manifest, video_data["Video ID"].tolist(), video_folder, audio_folder, audio_only)
+                for video_id in video_data["Video ID"]:
+                    host_limits.setdefault(urlparse(manifest.jobs[video_id]["url"]).netloc, threading.BoundedSemaphore(DOWNLOADS_PER_HOST))
+                    count("videos")
+                    download_queue.put(video_id)
+        except Exception as e:
+            logging.exception("Metadata stage failed")
+            failures.append(e)
+        finally:
+            for _ in range(download_workers):
+                download_queue.put(DONE)
+
+    def download_stage():
+        try:
+            while (video_id := download_queue.get()) is not DONE:
+                in_flight.acquire()  # Blocks while too many downloaded files still wait for transcription
+                mp3_paths = []
+                try:
+                    if manifest.is_done(video_id, audio_only) or run_download_job(manifest, video_id, video_folder, audio_folder, audio_only, host_limits):
+                        index_downloads(manifest, [video_id])
+                        count("downloaded")
+                        mp3_paths = [path for path in manifest.jobs[video_id]["files"] if path.endswith(".mp3")]
+                    else:
+                        count("download_failed")
+                except Exception:
+                    logging.exception(f"Download stage failed for {video_id}")
+                    count("download_failed")
+                if mp3_paths:
+                    chunk_queue.put(mp3_paths[0])
+                else:
+                    in_flight.release()
+        finally:
+            chunk_queue.put(DONE)
+
+    # Preprocesses one downloaded file (see flux.audio.preprocess_audio) and queues its chunks
+    def prepare_file(file_path):
+        try:
+            file_digest, cached = lookup_cached_file(file_path, transcript_cache, variant)
+            if cached is not None:
+                write_queue.put((file_path, cached_transcript_rows(cached), [], True))
+                return
+            job = prepare_job(file_path, file_digest, trim_silence)
+        except Exception as e:
+            write_queue.put((file_path, [], [(file_path, e)], False))
+            return
+        for chunk_idx in range(len(job.chunk_files)):
+            transcribe_queue.put((job, chunk_idx))
+
+    # Files are preprocessed on a pool with one ffmpeg process per core
+    def chunk_stage():
+        try:
+            with ThreadPoolExecutor(max_workers=preprocess_workers) as preprocessor:
+                finished_downloaders = 0
+                while finished_downloaders < download_workers:
+                    file_path = chunk_queue.get()
+                    if file_path is DONE:
+                        finished_downloaders += 1
+                        continue
+                    preprocessor.submit(prepare_file, file_path)
+        finally:
+            for _ in range(transcribe_workers):
+                transcribe_queue.put(DONE)
+
+    def transcribe_stage():
+        # Per-chunk errors are collected in the job, and every finished job reaches the write stage
+        # (which releases its in_flight slot) even when cleanup or caching fails
+        try:
+            while (task := transcribe_queue.get()) is not DONE:
+                job, chunk_idx = task
+                try:
+                    result, error = transcribe_chunk_cached(job.chunk_files[chunk_idx], transcript_cache), None
+                except Exception as e:
+                    result, error = None, e
+                if job.finish_chunk(chunk_idx, result, error):
+                    job.cache_transcript(transcript_cache, variant)
+                    write_queue.put((job.file_path, job.rows(), job.errors, False))
+        finally:
+            write_queue.put(DONE)
+
+    threads = [threading.Thread(target=metadata_stage, name="flux-metadata"), threading.Thread(target=chunk_stage, name="flux-chunk")]
+    threads += [threading.Thread(target=download_stage, name=f"flux-download-{i}") for i in range(download_workers)]
+    threads += [threading.Thread(target=transcribe_stage, name=f"flux-transcribe-{i}") for i in range(transcribe_workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    # Write stage runs in the calling thread so callbacks may update Streamlit widgets
+    finished_transcribers = 0
+    while finished_transcribers < transcribe_workers:
+        item = write_queue.get()
+        if item is DONE:
+            finished_transcribers += 1
+            continue
+        file_path, data, errors, from_cache = item
+        in_flight.release()
+        for chunk_file, e in errors:
+            logging.error(f"Transcription failed for {chunk_file}: {e}")
+
+        excel_file_path, text_file_path = transcript_output_paths(save_folder, file_path)
+        if not (from_cache and os.path.exists(excel_file_path) and os.path.exists(text_file_path)):
+            write_transcript_outputs(result_store, run_id, file_path, data, excel_file_path, text_file_path)
+            index_transcripts(file_path, excel_file_path, text_file_path)
+        count("transcribed")
+        if summary["time_to_first_transcript"] is None:
+            summary["time_to_first_transcript"] = time.monotonic() - started_at
+        if on_file_done:
+            on_file_done(file_path, excel_file_path, text_file_path, errors)
+
+    for thread in threads:
+        thread.join()
+    transcript_cache.save_index()
+    export_videos(result_store, os.path.join(save_folder, video_data_name), run_id)
+    summary["makespan"] = time.monotonic() - started_at
+    save_metrics(save_folder)
+    if failures:
+        # The videos handled before the failure are written and exported; the run itself still fails
+        summary["metadata_error"] = str(failures[0])
+        logging.error(f"Streaming pipeline stopped early: {summary}")
+        raise failures[0]
+    logging.info(f"Streaming pipeline finished: {summary}")
+    return summary
@@ -0,0 +1,295 @@
+"""Whisper transcription: a bounded worker pool with retries and a content-addressed result cache."""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from openai import OpenAI, APIConnectionError, APIStatusError, RateLimitError
+
+from flux.audio import PREPROCESS_WORKERS, WHISPER_MAX_BYTES, preprocess_audio, preprocess_variant, split_audio, to_original_time
+from flux.metrics import StageTimer, registry
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")  # Optional, eg. a local stub server for testing
+client = None  # Created on first use, see get_client()
+client_lock = threading.Lock()
+
+# Function to set the OpenAI credentials and/or endpoint
+def configure(api_key=None, base_url=None):
+    global OPENAI_API_KEY, OPENAI_BASE_URL, client
+    with client_lock:
+        if api_key:
+            OPENAI_API_KEY = api_key
+        if base_url:
+            OPENAI_BASE_URL = base_url
+        client = None
+
+# Function to get the shared OpenAI client
+# Retries are handled by transcribe_chunk so backoff is shared across the worker pool
+def get_client():
+    global client
+    with client_lock:
+        if client is None:
+            client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+    return client
+
+# Function to format timestamps
+def format_time_hms(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    remaining_seconds = seconds % 60
+    return f"{hours:02}:{minutes:02}:{int(remaining_seconds):02}" if hours else f"{minutes:02}:{int(remaining_seconds):02}"
+
+WHISPER_MODEL = "whisper-1"
+TRANSCRIBE_WORKERS = 8  # Concurrent transcription requests
+TRANSCRIBE_RETRIES = 5  # Retries per chunk on 429 / 5xx / connection errors
+
+# Function to decide whether a transcription error is worth retrying
+def is_retryable(error):
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+# Function to compute the wait before the next attempt: Retry-After when given, else exponential backoff with jitter
+def retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(60, 2 ** attempt) * random.uniform(0.5, 1.5)
+
+# Function to transcribe one audio chunk, retrying rate limits and server errors
+@StageTimer("transcribe")
+def transcribe_chunk(chunk_path, model=WHISPER_MODEL, response_format="verbose_json", retries=TRANSCRIBE_RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            with open(chunk_path, "rb") as audio_chunk:
+                transcription_data = get_client().audio.transcriptions.create(
+                    model=model,
+                    file=audio_chunk,
+                    response_format=response_format
+                )
+            registry.inc("flux_transcribe_bytes", os.path.getsize(chunk_path))
+            return transcription_data.model_dump()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            registry.inc("flux_transcribe_retries")
+            delay = retry_delay(e, attempt)
+            logging.warning(f"Transcription of {chunk_path} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+transcript_cache_folder_name = "Transcript Cache"
+
+class TranscriptCache:
+    """Content-addressed store of transcription results keyed by audio hash, model, response format and preprocessing."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_path = os.path.join(folder, "digests.json")
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        # path -> [size, mtime_ns, sha256] so unchanged files are not re-read on every run
+        self.digests = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.digests = json.load(f)
+
+    def file_digest(self, path, remember=True):
+        stat = os.stat(path)
+        known = self.digests.get(os.path.abspath(path))
+        if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        digest = sha256.hexdigest()
+        # Temporary chunk files are not remembered, they are deleted right after transcription
+        if remember:
+            with self.lock:
+                self.digests[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def entry_path(self, digest, kind, model, response_format, variant=None):
+        # kind is "file" for a whole transcript or "chunk" for one API response
+        # variant names the preprocessing of a source file (see flux.audio.preprocess_variant); chunks are uploaded as is
+        name = f"{digest}_{model}_{response_format}" + (f"_{variant}" if variant else "")
+        return os.path.join(self.folder, digest[:2], f"{name}.{kind}.json")
+
+    def get(self, digest, kind, model=WHISPER_MODEL, response_format="verbose_json", variant=None):
+        path = self.entry_path(digest, kind, model, response_format, variant)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, digest, kind, data, model=WHISPER_MODEL, response_format="verbose_json", variant=None):
+        path = self.entry_path(digest, kind, model, response_format, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def save_index(self):
+        with self.lock:
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.digests, f)
+            os.replace(tmp_path, self.index_path)
+
+# Function to transcribe one chunk unless the cache already holds its result
+def transcribe_chunk_cached(chunk_path, cache):
+    digest = cache.file_digest(chunk_path, remember=False)
+    transcription_data = cache.get(digest, "chunk")
+    if transcription_data is None:
+        transcription_data = transcribe_chunk(chunk_path)
+        cache.put(digest, "chunk", transcription_data)
+    return transcription_data
+
+# Function to turn the transcription segments of all chunks into [start, end, text] rows on the original timeline
+# offset_map maps times of audio with trimmed pauses back to the original (see flux.audio.preprocess_audio)
+def build_transcript_rows(chunk_results, chunk_start_times, offset_map=None):
+    data = []
+    for transcription_data, chunk_start_time in zip(chunk_results, chunk_start_times):
+        if not transcription_data or "segments" not in transcription_data:
+            continue
+        for segment in transcription_data["segments"]:
+            start_time = format_time_hms(to_original_time(segment.get("start", 0) + chunk_start_time, offset_map))
+            end_time = format_time_hms(to_original_time(segment.get("end", 0) + chunk_start_time, offset_map))
+            text = str(segment.get("text", "N/A"))  # Ensure text is a string
+
+            # Handle NaN values
+            start_time = start_time if start_time else "00:00"
+            end_time = end_time if end_time else "00:00"
+
+            data.append([start_time, end_time, text])
+    return data
+
+# Function to preprocess a file for upload and split it into chunks when it is still above the upload limit
+# Returns (chunk files, chunk start times, offset map); every chunk other than file_path is a temporary file
+def prepare_chunks(file_path, trim_silence=False):
+    upload_path, offset_map = preprocess_audio(file_path, trim_silence=trim_silence)
+    # ファイルサイズが25MBを超える場合は分割
+    if os.path.getsize(upload_path) > WHISPER_MAX_BYTES:
+        chunk_files, chunk_start_times = split_audio(upload_path)
+        if upload_path != file_path:
+            os.remove(upload_path)
+        return chunk_files, chunk_start_times, offset_map
+    return [upload_path], [0], offset_map  # Start from 0s if no split
+
+# Function to look up the complete cached transcript of a file
+# Returns (file digest, cache entry or None); both are None without a cache
+def lookup_cached_file(file_path, cache, variant):
+    if not cache:
+        return None, None
+    file_digest = cache.file_digest(file_path)
+    return file_digest, cache.get(file_digest, "file", variant=variant)
+
+# Function to turn a file-level cache entry into transcript rows
+def cached_transcript_rows(cached):
+    return build_transcript_rows(cached["results"], cached["chunk_start_times"], cached.get("offset_map"))
+
+class TranscriptionJob:
+    """The chunks of one file on their way through transcription, shared by the batch and streaming pipelines."""
+
+    def __init__(self, file_path, digest, chunk_files, chunk_start_times, offset_map):
+        self.file_path = file_path
+        self.digest = digest
+        self.chunk_files = chunk_files
+        self.chunk_start_times = chunk_start_times
+        self.offset_map = offset_map
+        self.results = [None] * len(chunk_files)
+        self.errors = []
+        self.pending = len(chunk_files)
+        self.lock = threading.Lock()
+
+    def finish_chunk(self, chunk_idx, result=None, error=None):
+        """Records the outcome of one chunk and removes it when temporary; True once every chunk has finished."""
+        chunk_file = self.chunk_files[chunk_idx]
+        try:
+            if chunk_file != self.file_path and os.path.exists(chunk_file):
+                os.remove(chunk_file)
+        except OSError as e:
+            logging.warning(f"Could not remove chunk file {chunk_file}: {e}")
+        with self.lock:
+            self.results[chunk_idx] = result
+            if error is not None:
+                self.errors.append((chunk_file, error))
+            self.pending -= 1
+            return self.pending == 0
+
+    def cache_transcript(self, cache, variant):
+        """Only complete transcripts are cached at file level; failed chunks are retried next run."""
+        if not cache or self.errors:
+            return
+        try:
+            cache.put(self.digest, "file", {"chunk_start_times": self.chunk_start_times, "offset_map": self.offset_map, "results": self.results}, variant=variant)
+        except Exception:
+            logging.exception(f"Could not cache the transcript of {self.file_path}")
+
+    def rows(self):
+        return build_transcript_rows(self.results, self.chunk_start_times, self.offset_map)
+
+# Function to preprocess and split one file into a TranscriptionJob (see prepare_chunks)
+def prepare_job(file_path, digest=None, trim_silence=False):
+    return TranscriptionJob(file_path, digest, *prepare_chunks(file_path, trim_silence))
+
+# Function to transcribe many files with one bounded worker pool shared by the chunks of all files
+# Files are preprocessed on a second pool with one ffmpeg process per core (see flux.audio.preprocess_audio)
+# Yields (file_path, rows, errors, from_cache) from the calling thread as soon as every chunk of a file has finished
+# With a TranscriptCache, files and chunks whose audio was transcribed before are served from the cache
+def transcribe_files(file_paths, workers=TRANSCRIBE_WORKERS, cache=None, trim_silence=False, preprocess_workers=PREPROCESS_WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as executor, ThreadPoolExecutor(max_workers=preprocess_workers) as preprocessor:
+        futures = {}
+        preparing = {}
+        variant = preprocess_variant(trim_silence)
+        for file_path in file_paths:
+            file_digest, cached = lookup_cached_file(file_path, cache, variant)
+            if cached is not None:
+                yield file_path, cached_transcript_rows(cached), [], True
+                continue
+            preparing[preprocessor.submit(prepare_job, file_path, file_digest, trim_silence)] = file_path
+
+        # Preprocessing and transcription futures are consumed together, so a file is yielded
+        # (and its temporary chunks removed) as soon as it is done, not after every file was preprocessed
+        pending = set(preparing)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in preparing:
+                    file_path = preparing.pop(future)
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        yield file_path, [], [(file_path, e)], False
+                        continue
+                    # Chunks start transcribing while the other files are still being preprocessed
+                    for chunk_idx, chunk_file in enumerate(job.chunk_files):
+                        if cache:
+                            chunk_future = executor.submit(transcribe_chunk_cached, chunk_file, cache)
+                        else:
+                            chunk_future = executor.submit(transcribe_chunk, chunk_file)
+                        futures[chunk_future] = (job, chunk_idx)
+                        pending.add(chunk_future)
+                    continue
+
+                job, chunk_idx = futures.pop(future)
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                if job.finish_chunk(chunk_idx, result, error):
+                    job.cache_transcript(cache, variant)
+                    yield job.file_path, job.rows(), job.errors, False
+
+    if cache:
+        cache.save_index()
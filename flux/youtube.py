@@ -0,0 +1,406 @@
+"""YouTube Data API access: batched, cached lookups of channels and videos."""
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from flux.client import QUOTA_COSTS, ApiClient, QuotaExceededError
+from flux.index import get_artifact_index
+from flux.inputs import CHANNEL_ID_PATTERN, canonical_handles, normalize_handles
+from flux.metrics import StageTimer
+from flux.schema import CHANNEL_FIELDS, VIDEO_FIELDS, flatten_items
+
+YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
+
+# Function to extract Channel ID from YouTube link
+def extract_channel_id(url):
+    pattern = r"(?:youtube\.com/(?:channel/|user/|c/|@|.*[?&]channel_id=))([A-Za-z0-9_-]+)"
+    match = re.search(pattern, url)
+    return match.group(1) if match else None
+
+YOUTUBE_API_URL = "https://www.googleapis.com/youtube/v3"
+MAX_IDS_PER_REQUEST = 50  # Upper limit of IDs accepted by a single *.list call
+VIDEO_PARTS = "snippet,statistics,contentDetails,player,status,topicDetails,recordingDetails,liveStreamingDetails"
+
+CHANNEL_PARTS = "snippet,statistics,brandingSettings,contentDetails"
+RESOLVE_WORKERS = 8  # Concurrent handle lookups in Step 2
+
+# Persistent API response cache
+api_cache_file = "api_cache.sqlite3"
+API_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Seconds each part stays fresh; an entry expires with the fastest-changing part it actually contains
+# (eg. liveStreamingDetails is only returned for live streams, so other videos keep the longer TTLs)
+PART_TTLS = {
+    "id": 30 * 24 * 3600,
+    "snippet": 7 * 24 * 3600,
+    "brandingSettings": 7 * 24 * 3600,
+    "contentDetails": 7 * 24 * 3600,
+    "topicDetails": 7 * 24 * 3600,
+    "recordingDetails": 7 * 24 * 3600,
+    "player": 7 * 24 * 3600,
+    "status": 24 * 3600,
+    "statistics": 3600,
+    "liveStreamingDetails": 300,
+}
+DEFAULT_TTL = 3600
+
+class ApiCache:
+    """SQLite cache of API items keyed by resource, ID and part set, with TTLs, ETags and LRU eviction.
+
+    It also keeps the quota ledger (units spent per quota day and endpoint) of the API client.
+    """
+
+    def __init__(self, path, max_bytes=API_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                key TEXT PRIMARY KEY, body TEXT, etag TEXT,
+                fetched_at REAL, expires_at REAL, accessed_at REAL, size INTEGER);
+            CREATE INDEX IF NOT EXISTS items_accessed ON items (accessed_at);
+            CREATE TABLE IF NOT EXISTS batches (key TEXT PRIMARY KEY, etag TEXT, accessed_at REAL);
+            CREATE TABLE IF NOT EXISTS quota_usage (day TEXT, endpoint TEXT, units INTEGER, PRIMARY KEY (day, endpoint));
+        """)
+        # Batch ETags are evicted with the items, older caches lack their access time
+        if "accessed_at" not in [row[1] for row in self.conn.execute("PRAGMA table_info(batches)")]:
+            self.conn.execute("ALTER TABLE batches ADD COLUMN accessed_at REAL")
+            self.conn.commit()
+
+    @staticmethod
+    def make_key(resource, item_id, part):
+        return f"{resource}|{','.join(sorted(part.split(',')))}|{item_id}"
+
+    @staticmethod
+    def ttl_for(part, item=None):
+        names = part.split(",")
+        if isinstance(item, dict):
+            # Entries that are not API resources (eg. handle -> channel ID) have none of the parts and keep them all
+            names = [name for name in names if name in item] or names
+        return min(PART_TTLS.get(name, DEFAULT_TTL) for name in names)
+
+    def get_many(self, resource, ids, part):
+        """Returns ({id: item} for fresh entries, [ids that are missing or stale])."""
+        now = time.time()
+        fresh, stale = {}, []
+        with self.lock:
+            for item_id in ids:
+                key = self.make_key(resource, item_id, part)
+                row = self.conn.execute("SELECT body, expires_at FROM items WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    fresh[item_id] = json.loads(row[0])
+                    self.conn.execute("UPDATE items SET accessed_at = ? WHERE key = ?", (now, key))
+                else:
+                    stale.append(item_id)
+            self.conn.commit()
+        return fresh, stale
+
+    def get_stale(self, resource, ids, part):
+        """Returns cached items regardless of age (used for ETag revalidation)."""
+        items = {}
+        with self.lock:
+            for item_id in ids:
+                row = self.conn.execute("SELECT body FROM items WHERE key = ?", (self.make_key(resource, item_id, part),)).fetchone()
+                if row:
+                    items[item_id] = json.loads(row[0])
+        return items
+
+    def put_many(self, resource, items, part):
+        now = time.time()
+        with self.lock:
+            for item_id, item in items.items():
+                body = json.dumps(item, ensure_ascii=False)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.make_key(resource, item_id, part), body, item.get("etag") if isinstance(item, dict) else None,
+                     now, now + self.ttl_for(part, item), now, len(body)),
+                )
+            self.conn.commit()
+            self.evict()
+
+    def touch_many(self, resource, items, part):
+        """Marks {id: item} entries fresh again after the server confirmed they did not change."""
+        now = time.time()
+        with self.lock:
+            for item_id, item in items.items():
+                self.conn.execute(
+                    "UPDATE items SET fetched_at = ?, expires_at = ?, accessed_at = ? WHERE key = ?",
+                    (now, now + self.ttl_for(part, item), now, self.make_key(resource, item_id, part)),
+                )
+            self.conn.commit()
+
+    def batch_key(self, resource, ids, part):
+        return self.make_key(resource, ",".join(sorted(ids)), part)
+
+    def get_batch_etag(self, resource, ids, part):
+        key = self.batch_key(resource, ids, part)
+        with self.lock:
+            row = self.conn.execute("SELECT etag FROM batches WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.conn.execute("UPDATE batches SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+        return row[0] if row else None
+
+    def put_batch_etag(self, resource, ids, part, etag):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO batches VALUES (?, ?, ?)", (self.batch_key(resource, ids, part), etag, time.time()))
+            self.conn.commit()
+            self.evict()
+
+    def add_quota_usage(self, day, endpoint, units):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO quota_usage VALUES (?, ?, ?) ON CONFLICT (day, endpoint) DO UPDATE SET units = units + excluded.units",
+                (day, endpoint, units),
+            )
+            self.conn.commit()
+
+    def quota_usage(self, day):
+        """Returns {endpoint: units} spent on one quota day."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT endpoint, units FROM quota_usage WHERE day = ?", (day,)).fetchall())
+
+    def quota_used(self, day):
+        return sum(self.quota_usage(day).values())
+
+    def evict(self):
+        """Drops least recently used items and batch ETags until the cache fits in max_bytes (caller holds the lock)."""
+        entries = """
+            SELECT 'items', key, size, accessed_at FROM items
+            UNION ALL SELECT 'batches', key, LENGTH(key) + COALESCE(LENGTH(etag), 0), COALESCE(accessed_at, 0) FROM batches"""
+        total = self.conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM ({entries})").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for table, key, size, _ in self.conn.execute(f"{entries} ORDER BY 4").fetchall():
+            self.conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self.conn.commit()
+
+api_cache = None  # Created on first use, see get_api_cache()
+api_cache_lock = threading.Lock()
+api_client = None  # Created on first use, see get_api_client()
+api_client_lock = threading.Lock()
+
+# Function to set the API key, the location of the response cache, the daily quota budget
+# and/or the API endpoint (eg. a local stub server for benchmarks)
+def configure(api_key=None, cache_path=None, daily_quota=None, base_url=None):
+    global YOUTUBE_API_KEY, api_cache
+    if api_key:
+        YOUTUBE_API_KEY = api_key
+    if cache_path:
+        api_cache = ApiCache(cache_path)
+    client = get_api_client()
+    client.api_key = YOUTUBE_API_KEY
+    client.ledger = get_api_cache()
+    if daily_quota:
+        client.daily_quota = daily_quota
+    if base_url:
+        client.base_url = base_url
+
+# Function to get the shared response cache, opening it on first use
+def get_api_cache():
+    global api_cache
+    with api_cache_lock:
+        if api_cache is None:
+            api_cache = ApiCache(api_cache_file)
+    return api_cache
+
+# Function to get the shared API client (one pooled session, quota ledger in the response cache)
+def get_api_client():
+    global api_client
+    with api_client_lock:
+        if api_client is None:
+            api_client = ApiClient(YOUTUBE_API_URL, YOUTUBE_API_KEY, ledger=get_api_cache(), pool_size=RESOLVE_WORKERS * 2)
+    return api_client
+
+# In-process cache of channel ID -> handle, shared across batches and reruns
+channel_handle_cache = {}
+
+# Function to split a list into batches of at most `size` items
+def chunked(items, size=MAX_IDS_PER_REQUEST):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+# Function to fetch resource items (videos, channels, ...) by ID, 50 IDs per request
+# Fresh items are served from api_cache; stale batches are revalidated with their ETag
+@StageTimer("api_fetch")
+def fetch_items_by_id(resource, ids, part):
+    cache = get_api_cache()
+    items, stale = cache.get_many(resource, list(dict.fromkeys(ids)), part)  # De-duplicate while keeping order
+    for batch in chunked(stale):
+        params = {"part": part, "id": ",".join(batch)}
+        # Only revalidate when every item of the batch is still cached, otherwise a 304 would leave gaps
+        cached = cache.get_stale(resource, batch, part)
+        etag = cache.get_batch_etag(resource, batch, part) if len(cached) == len(batch) else None
+        headers = {"If-None-Match": etag} if etag else {}
+        response = get_api_client().get(resource, params, headers)
+
+        if response.status_code == 304:
+            cache.touch_many(resource, cached, part)
+            items.update(cached)
+        elif response.status_code == 200:
+            data = response.json()
+            fetched = {item["id"]: item for item in data.get("items", [])}
+            cache.put_many(resource, fetched, part)
+            if data.get("etag"):
+                cache.put_batch_etag(resource, batch, part, data["etag"])
+            items.update(fetched)
+        else:
+            logging.warning(f"{resource}.list failed ({response.status_code}) for {len(batch)} IDs")
+    return items
+
+# Function to get channel handles (usernames) for many channel IDs at once
+def get_channel_handles(channel_ids):
+    missing = [cid for cid in dict.fromkeys(channel_ids) if cid and cid != "N/A" and cid not in channel_handle_cache]
+    if missing:
+        items = fetch_items_by_id("channels", missing, "snippet")
+        for channel_id in missing:
+            channel_info = items.get(channel_id, {}).get("snippet", {})
+            handle_name = channel_info.get("customUrl", "@Unknown")  # YouTube handle or "@Unknown"
+            # Only memoize real answers so a failed request is retried on the next run
+            if channel_id in items:
+                channel_handle_cache[channel_id] = handle_name
+    return {cid: channel_handle_cache.get(cid, "@Unknown") for cid in channel_ids}
+
+# Function to get channel handle (username) from channel ID
+def get_channel_handle(channel_id):
+    return get_channel_handles([channel_id])[channel_id]
+
+# Function to find the channel ID for a handle (eg. @Hunter_Channel), using the cache when possible
+def resolve_channel_id(handle):
+    handle = str(handle).strip()
+    cache = get_api_cache()
+    cached, _ = cache.get_many("handles", [handle], "id")
+    if handle in cached:
+        return cached[handle]["channelId"]
+    # Handles resolved in any earlier run are kept in the artifact index, which is never evicted
+    channel_id = get_artifact_index().find_channel_id(handle) or lookup_channel_id(handle)
+    if channel_id:
+        cache.put_many("handles", {handle: {"channelId": channel_id}}, "id")
+    return channel_id
+
+# Function to look up a channel ID on the API
+# Tries the 1-unit channels.list lookups first and only falls back to the 100-unit search.list
+# Links and names are canonicalized first (see flux.inputs.canonical_handles), so the kind of name picks the lookup
+@StageTimer("api_fetch")
+def lookup_channel_id(handle):
+    canonical = canonical_handles([handle]).iloc[0]
+    if pd.isna(canonical):
+        channel_id = extract_channel_id(handle)  # eg. a link with ?channel_id=
+        return channel_id if channel_id and re.fullmatch(CHANNEL_ID_PATTERN, channel_id) else None
+    handle = canonical
+    if re.fullmatch(CHANNEL_ID_PATTERN, handle):
+        return handle  # Already a channel ID (canonical form of /channel/ links)
+    kind, _, name = handle.rpartition(":")
+    name = name.lstrip("@")
+
+    if kind == "user":
+        lookups = [{"forUsername": name}]  # Legacy username
+    elif kind == "c":
+        lookups = [{"forUsername": name}]  # The API has no lookup by custom URL, it often matches the username
+    else:
+        lookups = [{"forHandle": f"@{name}"}, {"forUsername": name}]  # A bare name may also be a username
+    for lookup in lookups:
+        response = get_api_client().get("channels", dict(lookup, part="id"))
+        if response.status_code == 200 and response.json().get("items"):
+            return response.json()["items"][0]["id"]
+
+    params = {"part": "snippet", "q": name, "type": "channel", "maxResults": 1}
+    response = get_api_client().get("search", params)
+    if response.status_code == 200 and response.json().get("items"):
+        return response.json()["items"][0]["id"]["channelId"]
+    return None
+
+# Function to resolve many handles concurrently on a bounded thread pool
+def resolve_channel_ids(handles, max_workers=RESOLVE_WORKERS):
+    unique_handles = list(dict.fromkeys(handles))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        channel_ids = list(executor.map(resolve_channel_id, unique_handles))
+    return dict(zip(unique_handles, channel_ids))
+
+# Function to get channel information for many handles as a typed DataFrame (see flux.schema)
+# Returns the channel rows, in handle order, and the handles that could not be resolved
+def get_channels_details(handles):
+    channel_ids = resolve_channel_ids(handles)
+    items = fetch_items_by_id("channels", [cid for cid in channel_ids.values() if cid], CHANNEL_PARTS)
+
+    found = [handle for handle in handles if channel_ids.get(handle) in items]
+    not_found = [handle for handle in handles if channel_ids.get(handle) not in items]
+    channel_frame = flatten_items([items[channel_ids[handle]] for handle in found], CHANNEL_FIELDS)
+    channel_frame.insert(0, "Handle", pd.Series(found, dtype="string"))
+    return channel_frame, not_found
+
+# Function to get detailed information for a whole list of videos as a typed DataFrame indexed by video ID
+# (one videos.list call per 50 IDs and one channels.list call per 50 distinct channels)
+def get_videos_details(video_ids):
+    items = fetch_items_by_id("videos", video_ids, VIDEO_PARTS)
+    video_frame = flatten_items(list(items.values()), VIDEO_FIELDS)
+    handles = get_channel_handles(video_frame["Channel ID"].dropna().tolist())
+    video_frame.insert(0, "Handle Name", video_frame["Channel ID"].map(handles).fillna("@Unknown").astype("category"))
+    video_frame.index = video_frame["Video ID"].tolist()
+    return video_frame
+
+# Function to get detailed video information as a dict (None when the video was not found)
+def get_video_details(video_id):
+    video_frame = get_videos_details([video_id])
+    return video_frame.loc[video_id].to_dict() if video_id in video_frame.index else None
+
+# Function to list the newest videos of a playlist (eg. a channel's uploads), 50 per page
+# Paging stops at stop_at_video_id or at the first video published at or before published_after,
+# so an incremental sync of an unchanged channel costs a single 1-unit playlistItems.list call
+# Returns ([(video_id, published_at)] newest first, complete); complete is False when a page failed,
+# in which case the list holds only the pages fetched before the failure
+@StageTimer("api_fetch")
+def list_playlist_videos(playlist_id, stop_at_video_id=None, published_after=None):
+    videos = []
+    params = {"part": "contentDetails", "playlistId": playlist_id, "maxResults": MAX_IDS_PER_REQUEST}
+    while True:
+        response = get_api_client().get("playlistItems", params)
+        if response.status_code != 200:
+            logging.warning(f"playlistItems.list failed ({response.status_code}) for {playlist_id}")
+            return videos, False
+        data = response.json()
+        for item in data.get("items", []):
+            video_id = item["contentDetails"]["videoId"]
+            published_at = item["contentDetails"].get("videoPublishedAt", "")
+            if video_id == stop_at_video_id or (published_after and published_at and published_at <= published_after):
+                return videos, True
+            videos.append((video_id, published_at))
+        if not data.get("nextPageToken"):
+            return videos, True
+        params["pageToken"] = data["nextPageToken"]
+
+# Function to estimate the quota units a run will spend, counting only lookups that are not cached
+# playlists is the number of uploads playlists to crawl (at least one page each)
+# Returns {"expected": units, "worst_case": units, "remaining": units left today}
+def estimate_quota(handles=(), video_ids=(), playlists=0):
+    cache = get_api_cache()
+    handles, _ = normalize_handles(handles)
+    resolved, unresolved = cache.get_many("handles", handles, "id")
+    _, stale_channels = cache.get_many("channels", list({item["channelId"] for item in resolved.values()}), CHANNEL_PARTS)
+    _, stale_videos = cache.get_many("videos", list(dict.fromkeys(video_ids)), VIDEO_PARTS)
+
+    channel_batches = math.ceil((len(unresolved) + len(stale_channels)) / MAX_IDS_PER_REQUEST)
+    # Each videos.list batch is followed by at most one channels.list batch for the handles
+    video_batches = 2 * math.ceil(len(stale_videos) / MAX_IDS_PER_REQUEST)
+    fixed = channel_batches + video_batches + playlists
+    return {
+        # forHandle usually answers; the worst case is forHandle + forUsername + search.list
+        "expected": fixed + len(unresolved),
+        "worst_case": fixed + len(unresolved) * (2 + QUOTA_COSTS["search"]),
+        "remaining": get_api_client().quota_remaining(),
+    }
+
+# Function to stop a run before its first call when its expected quota use does not fit in today's budget
+def ensure_quota(estimate):
+    logging.info(f"Quota estimate: {estimate}")
+    if estimate["expected"] > estimate["remaining"]:
+        raise QuotaExceededError(f"This run needs about {estimate['expected']} quota units but only {estimate['remaining']} are left today")
@@ -0,0 +1,106 @@
+"""Shared fixtures: the local stub servers of benchmarks/stubs.py, with flux wired to them."""
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import stubs
+from flux import index, transcribe, youtube
+from flux.client import TokenBucket
+
+class RecordingYouTubeStubHandler(stubs.YouTubeStubHandler):
+    """Records every request and answers 304 when If-None-Match carries the stub's ETag."""
+
+    requests = []  # (endpoint, params, If-None-Match), replaced per fixture
+
+    def do_GET(self):
+        endpoint = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        query = self.path.split("?", 1)[1] if "?" in self.path else ""
+        params = dict(pair.split("=", 1) for pair in query.split("&") if "=" in pair)
+        params.pop("key", None)
+        etag = self.headers.get("If-None-Match")
+        self.requests.append((endpoint, params, etag))
+        if etag == "bench":
+            self.send_response(304)
+            self.end_headers()
+            return
+        super().do_GET()
+
+# The YouTube API stub; yields the list of requests it received
+# flux.youtube gets a fresh API cache, client and artifact index in tmp_path
+@pytest.fixture
+def youtube_stub(tmp_path, monkeypatch):
+    requests = []
+    handler_class = type("YouTubeStubHandler", (RecordingYouTubeStubHandler,), {"requests": requests})
+    server, base_url = stubs.start_server(handler_class)
+    monkeypatch.setattr(youtube, "api_cache", youtube.ApiCache(str(tmp_path / youtube.api_cache_file)))
+    monkeypatch.setattr(youtube, "api_client", None)
+    monkeypatch.setattr(youtube, "channel_handle_cache", {})
+    monkeypatch.setattr(index, "artifact_index", index.ArtifactIndex(str(tmp_path / index.artifact_index_file)))
+    youtube.configure(api_key="test", base_url=base_url)
+    youtube.get_api_client().bucket = TokenBucket(rate=10 ** 6, capacity=10 ** 6)
+    yield requests
+    server.shutdown()
+
+# Page tokens whose playlistItems page is answered with a 403 (not retried); empty at first
+@pytest.fixture
+def failing_pages(youtube_stub, monkeypatch):
+    pages = set()
+    session = youtube.get_api_client().session
+    session_get = session.get
+
+    def get(url, params=None, **kwargs):
+        if params.get("pageToken") in pages:
+            response = requests.Response()
+            response.status_code = 403
+            response._content = b"{}"
+            return response
+        return session_get(url, params=params, **kwargs)
+
+    monkeypatch.setattr(session, "get", get)
+    return pages
+
+class ScriptedWhisperStubHandler(stubs.WhisperStubHandler):
+    """Answers with the queued error statuses first, then with transcripts; delays[i] holds back the i-th request."""
+
+    lock = threading.Lock()
+    statuses = []  # HTTP statuses of the next responses, replaced per fixture
+    delays = []
+    requests = []  # Upload sizes in arrival order
+
+    def do_POST(self):
+        with self.lock:
+            delay = self.delays[len(self.requests)] if len(self.requests) < len(self.delays) else 0
+            self.requests.append(int(self.headers.get("Content-Length", 0)))
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(delay)
+        if status == 200:
+            super().do_POST()
+            return
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"error": {"message": "stub error"}}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+# The Whisper API stub with two segments per chunk; yields its handler class to script responses
+# flux.transcribe gets a fresh client pointed at the stub
+@pytest.fixture
+def whisper_stub(monkeypatch):
+    handler_class = type("WhisperStubHandler", (ScriptedWhisperStubHandler,), {
+        "latency": 0, "segments_per_chunk": 2, "statuses": [], "delays": [], "requests": [],
+    })
+    server, base_url = stubs.start_server(handler_class)
+    for name in ("OPENAI_API_KEY", "OPENAI_BASE_URL", "client"):
+        monkeypatch.setattr(transcribe, name, getattr(transcribe, name))
+    transcribe.configure(api_key="test", base_url=base_url)
+    yield handler_class
+    server.shutdown()
@@ -0,0 +1,53 @@
+"""Tests of the split planning and the silence trimming offset maps."""
+import os
+import shutil
+
+import pytest
+import stubs
+
+from flux.audio import build_offset_map, plan_kept_frames, plan_split_points, split_audio, to_original_time
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+def test_split_points_move_back_to_the_latest_close_pause():
+    silences = [(18.0, 20.0), (38.0, 40.0), (58.0, 60.0)]
+    assert plan_split_points(120.0, 50.0, silences, search_seconds=15) == [39.0, 89.0]
+    # Pauses before the previous split point or farther back than search_seconds are ignored
+    assert plan_split_points(120.0, 50.0, [(8.0, 10.0)], search_seconds=15) == [50.0, 100.0]
+    assert plan_split_points(100.0, 100.0, silences) == []
+
+@requires_ffmpeg
+def test_split_audio_cuts_in_pauses_below_the_size_limit(tmp_path):
+    # 18 s of tone then 2 s of silence, repeated; at 32 kbps a 200 kB limit allows 47.5 s chunks
+    file_path = stubs.make_synthetic_mp3(str(tmp_path / "talk.mp3"), 120, bitrate="32k")
+    chunk_paths, chunk_start_times = split_audio(file_path, max_chunk_bytes=200_000)
+    assert len(chunk_paths) == 3
+    assert chunk_start_times == [0.0, pytest.approx(39.0, abs=0.1), pytest.approx(79.0, abs=0.1)]
+    assert all(os.path.getsize(path) < 200_000 for path in chunk_paths)
+    assert not os.path.exists(str(tmp_path / "talk_parts.csv"))
+
+def test_offset_map_round_trip():
+    silences = [(10.0, 20.0), (30.0, 30.5), (40.0, 45.0)]  # The 0.5 s pause is too short to trim
+    spans = plan_kept_frames(60.0, silences)
+    offset_map = build_offset_map(spans)
+    assert spans == [(0, 1024), (1975, 4024), (4475, 6000)]
+    assert offset_map == [[0.0, 0.0], pytest.approx([10.25, 19.75]), pytest.approx([30.75, 44.75])]
+
+    # Every kept moment of the original maps back to itself
+    for original in [0.0, 5.0, 10.2, 19.8, 25.0, 30.25, 39.5, 44.8, 59.9]:
+        output_start, original_start = max(entry for entry in offset_map if entry[1] <= original)
+        assert to_original_time(original - original_start + output_start, offset_map) == pytest.approx(original)
+
+def test_offset_map_without_trimming():
+    spans = plan_kept_frames(60.0, [(10.0, 11.0)])
+    assert spans == [(0, 6000)]
+    assert build_offset_map(spans) == [[0.0, 0.0]]
+    assert to_original_time(42.0, build_offset_map(spans)) == 42.0
+    assert to_original_time(42.0, []) == 42.0
+
+def test_offset_map_leading_silence():
+    # Like every trimmed pause, a leading one is shortened to TRIM_KEEP_SECONDS, half on each side of the cut
+    offset_map = build_offset_map(plan_kept_frames(30.0, [(0.0, 10.0)]))
+    assert offset_map == [[0.0, 0.0], pytest.approx([0.25, 9.75])]
+    assert to_original_time(0.1, offset_map) == pytest.approx(0.1)
+    assert to_original_time(1.0, offset_map) == pytest.approx(10.5)
@@ -0,0 +1,70 @@
+"""Tests of the API client: request rate, quota charging and retries."""
+import time
+
+import pytest
+import stubs
+
+from flux.client import ApiClient, QuotaExceededError, TokenBucket, quota_day
+from flux.youtube import ApiCache, ensure_quota
+
+class ScriptedHandler(stubs.QuietHandler):
+    """Answers with the queued (status, body) pairs, then with an empty item list."""
+
+    responses = []  # Replaced per fixture
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        status, body = self.responses.pop(0) if self.responses else (200, {"items": []})
+        self.send_json(body, status=status)
+
+# The scripted server; yields its handler class, with the server URL as base_url
+@pytest.fixture
+def api_stub(monkeypatch):
+    handler_class = type("ScriptedHandler", (ScriptedHandler,), {"responses": [], "requests": []})
+    server, base_url = stubs.start_server(handler_class)
+    handler_class.base_url = base_url
+    monkeypatch.setattr(ApiClient, "retry_delay", staticmethod(lambda response, attempt: 0))
+    yield handler_class
+    server.shutdown()
+
+def test_token_bucket_allows_a_burst_then_the_steady_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    started_at = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started_at < 0.05
+    for _ in range(10):
+        bucket.acquire()
+    assert 0.15 < time.monotonic() - started_at < 1.0  # 10 more tokens at 50 per second
+
+def test_calls_are_refused_once_the_daily_budget_is_spent(tmp_path, api_stub):
+    ledger = ApiCache(str(tmp_path / "cache.sqlite3"))
+    client = ApiClient(api_stub.base_url, api_key="test", daily_quota=103, ledger=ledger)
+    assert client.get("search", {}).status_code == 200
+    assert client.get("videos", {}).status_code == 200
+    assert client.quota_remaining() == 2
+
+    with pytest.raises(QuotaExceededError):
+        client.get("search", {})
+    assert len(api_stub.requests) == 2  # Refused before it was sent
+
+    # Another client on the same ledger (eg. the next run today) shares the budget
+    other = ApiClient(api_stub.base_url, api_key="test", daily_quota=103, ledger=ledger)
+    assert other.quota_remaining() == 2 and ledger.quota_usage(quota_day()) == {"search": 100, "videos": 1}
+    with pytest.raises(QuotaExceededError):
+        ensure_quota({"expected": 3, "worst_case": 3, "remaining": other.quota_remaining()})
+
+def test_retried_attempts_are_billed_and_quota_errors_stop_the_run(api_stub):
+    client = ApiClient(api_stub.base_url, api_key="test", retries=2)
+    api_stub.responses = [(503, {}), (429, {}), (200, {"items": [1]})]
+    assert client.get("videos", {}).json() == {"items": [1]}
+    assert client.quota_used() == 3
+
+    # Other client errors are returned to the caller as they are
+    api_stub.responses = [(404, {"error": {}})]
+    assert client.get("videos", {}).status_code == 404
+    api_stub.responses = [(403, {"error": {"errors": [{"reason": "quotaExceeded"}]}})]
+    with pytest.raises(QuotaExceededError):
+        client.get("videos", {})
+    assert len(api_stub.requests) == 5
@@ -0,0 +1,93 @@
+"""Tests of the resumable download scheduler, with yt-dlp replaced by a fake that writes the files."""
+import json
+import os
+
+import pytest
+
+from flux import download
+from flux.download import DownloadManifest, artifact_path, run_download_jobs
+from flux.inputs import video_url
+
+# Fake download_media: writes the MP3 (and MP4) of each link and records the calls
+@pytest.fixture
+def fake_downloads(tmp_path, monkeypatch):
+    calls = []
+    failing = set()
+
+    def download_media(youtube_links, video_folder, audio_folder, audio_only=False, progress_hooks=()):
+        video_id = youtube_links[0].rsplit("=", 1)[1]
+        calls.append((video_id, audio_only))
+        if video_id in failing:
+            raise RuntimeError("HTTP Error 403")
+        files = [artifact_path(audio_folder, video_id, "mp3")]
+        if not audio_only:
+            files.insert(0, artifact_path(video_folder, video_id, "mp4"))
+        for path in files:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"media")
+        return files
+
+    monkeypatch.setattr(download, "download_media", download_media)
+    monkeypatch.setattr(download, "DOWNLOAD_RETRIES", 0)
+    return calls, failing
+
+# Function to run the jobs of video_ids in the manifest of tmp_path
+def run_jobs(tmp_path, video_ids, audio_only):
+    manifest = DownloadManifest(str(tmp_path / download.download_manifest_name))
+    manifest.add_jobs({video_id: video_url(video_id) for video_id in video_ids})
+    counts = run_download_jobs(manifest, str(tmp_path / "Video"), str(tmp_path / "Audio"), audio_only=audio_only, video_ids=video_ids)
+    return manifest, counts
+
+def test_finished_jobs_are_skipped_and_interrupted_jobs_resumed(tmp_path, fake_downloads):
+    calls, _ = fake_downloads
+    run_jobs(tmp_path, ["aaaaaaaaaaa", "bbbbbbbbbbb"], audio_only=True)
+    assert sorted(calls) == [("aaaaaaaaaaa", True), ("bbbbbbbbbbb", True)]
+
+    # A job left "running" by an interrupted page is queued again on load
+    manifest_path = tmp_path / download.download_manifest_name
+    jobs = json.loads(manifest_path.read_text(encoding="utf-8"))
+    jobs["bbbbbbbbbbb"].update(status="running", files=[])
+    os.remove(artifact_path(str(tmp_path / "Audio"), "bbbbbbbbbbb", "mp3"))
+    manifest_path.write_text(json.dumps(jobs), encoding="utf-8")
+    assert DownloadManifest(str(manifest_path)).jobs["bbbbbbbbbbb"]["status"] == "queued"
+
+    calls.clear()
+    manifest, counts = run_jobs(tmp_path, ["aaaaaaaaaaa", "bbbbbbbbbbb"], audio_only=True)
+    assert calls == [("bbbbbbbbbbb", True)]
+    assert counts == {"queued": 0, "running": 0, "done": 2, "failed": 0}
+
+def test_mp3_only_jobs_are_not_done_for_mp4_downloads(tmp_path, fake_downloads):
+    calls, _ = fake_downloads
+    manifest, _ = run_jobs(tmp_path, ["aaaaaaaaaaa"], audio_only=True)
+    assert manifest.is_done("aaaaaaaaaaa", audio_only=True)
+    assert not manifest.is_done("aaaaaaaaaaa", audio_only=False)
+
+    calls.clear()
+    manifest, counts = run_jobs(tmp_path, ["aaaaaaaaaaa"], audio_only=False)
+    assert calls == [("aaaaaaaaaaa", False)]
+    assert counts["done"] == 1 and manifest.is_done("aaaaaaaaaaa", audio_only=False)
+
+    # The MP4 + MP3 job also covers MP3-only runs
+    calls.clear()
+    run_jobs(tmp_path, ["aaaaaaaaaaa"], audio_only=True)
+    assert calls == []
+
+def test_only_the_requested_jobs_run_and_count(tmp_path, fake_downloads):
+    calls, failing = fake_downloads
+    failing.add("fffffffffff")
+    _, counts = run_jobs(tmp_path, ["fffffffffff", "aaaaaaaaaaa"], audio_only=True)
+    assert counts == {"queued": 0, "running": 0, "done": 1, "failed": 1}
+
+    # A later sheet neither retries the failed job of the earlier one nor counts it
+    calls.clear()
+    _, counts = run_jobs(tmp_path, ["ccccccccccc"], audio_only=True)
+    assert calls == [("ccccccccccc", True)]
+    assert counts == {"queued": 0, "running": 0, "done": 1, "failed": 0}
+
+    # Rerunning the earlier sheet retries only its failed job
+    calls.clear()
+    failing.clear()
+    _, counts = run_jobs(tmp_path, ["fffffffffff", "aaaaaaaaaaa"], audio_only=True)
+    assert calls == [("fffffffffff", True)]
+    assert counts == {"queued": 0, "running": 0, "done": 2, "failed": 0}
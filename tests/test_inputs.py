@@ -0,0 +1,46 @@
+"""Tests of link and handle normalization."""
+import pandas as pd
+
+from flux.inputs import canonical_handles, normalize_handles, normalize_video_links
+
+def test_normalize_video_links():
+    links = [
+        "https://www.youtube.com/watch?v=abcdefghijk",
+        "https://youtu.be/abcdefghijk?t=42",
+        "https://www.youtube.com/watch?feature=share&v=abcdefghijk&t=1s",
+        "https://www.youtube.com/shorts/bbbbbbbbbbb",
+        "https://www.youtube.com/embed/ccccccccccc",
+        "https://www.youtube.com/live/ddddddddddd?si=x",
+        " eeeeeeeeeee ",
+        "https://example.com/x",
+        None,
+    ]
+    video_ids, invalid = normalize_video_links(links)
+    assert video_ids == ["abcdefghijk", "bbbbbbbbbbb", "ccccccccccc", "ddddddddddd", "eeeeeeeeeee"]
+    assert invalid == ["https://example.com/x"]
+
+def test_canonical_handles():
+    values = [
+        "@Foo",
+        "Foo",
+        "https://www.youtube.com/@Foo/videos",
+        "https://www.youtube.com/user/Foo",
+        "https://www.youtube.com/c/Foo",
+        "https://www.youtube.com/channel/UCaaaaaaaaaaaaaaaaaaaaaa",
+        "UCaaaaaaaaaaaaaaaaaaaaaa",
+        "https://www.youtube.com/@B%C3%A4r",
+        "two words",
+    ]
+    assert canonical_handles(values).tolist() == [
+        "@Foo", "@Foo", "@Foo", "user:Foo", "c:Foo",
+        "UCaaaaaaaaaaaaaaaaaaaaaa", "UCaaaaaaaaaaaaaaaaaaaaaa", "@Bär", pd.NA,
+    ]
+
+def test_normalize_handles():
+    values = ["@Foo", "@foo", "https://www.youtube.com/user/Foo", "user:foo", "c:Foo", "UCaaaaaaaaaaaaaaaaaaaaaa", "", "a/b", None]
+    handles, invalid = normalize_handles(values)
+    # Case differences are duplicates, but @handles, /user/ names and /c/ names are different channels
+    assert handles == ["@Foo", "user:Foo", "c:Foo", "UCaaaaaaaaaaaaaaaaaaaaaa"]
+    assert invalid == ["", "a/b"]
+    # Canonical handles are canonical again
+    assert normalize_handles(handles) == (handles, [])
@@ -0,0 +1,33 @@
+"""Tests of the JSONL log tail reader."""
+import json
+
+from flux.logs import read_lines_reversed, tail_records
+
+# Function to write log records (and optional plain-text lines before them) to a file
+def write_records(path, records, extra_lines=()):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in extra_lines:
+            f.write(line + "\n")
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+def test_read_lines_reversed_across_blocks(tmp_path):
+    path = tmp_path / "lines.txt"
+    lines = [f"line {i} " + "x" * i for i in range(50)]
+    path.write_text("\n".join(lines) + "\n\n", encoding="utf-8")
+    assert [line.decode() for line in read_lines_reversed(path, block_size=7)] == lines[::-1]
+
+def test_tail_records(tmp_path):
+    path = tmp_path / "log.jsonl"
+    levels = ["INFO", "WARNING", "ERROR"]
+    # Rotated file 1 holds older records than the live file
+    write_records(f"{path}.1", [{"level": levels[i % 3], "run_id": "run-1", "message": f"old {i}"} for i in range(10)],
+                  extra_lines=["plain text line from the old log"])
+    write_records(path, [{"level": levels[i % 3], "run_id": "run-2", "message": f"new {i}"} for i in range(5)])
+
+    assert [record["message"] for record in tail_records(path, limit=3)] == ["new 2", "new 3", "new 4"]
+    assert [record["message"] for record in tail_records(path, limit=7)] == ["old 8", "old 9", "new 0", "new 1", "new 2", "new 3", "new 4"]
+    assert len(tail_records(path, limit=100)) == 15
+    assert [record["message"] for record in tail_records(path, run_id="run-1", limit=2)] == ["old 8", "old 9"]
+    assert [record["message"] for record in tail_records(path, min_level="ERROR")] == ["old 2", "old 5", "old 8", "new 2"]
+    assert tail_records(tmp_path / "missing.jsonl") == []
@@ -0,0 +1,35 @@
+"""Tests of the uploads crawler against the YouTube API stub."""
+from flux.pipeline import crawl_channel_uploads, read_video_ids
+from flux.store import ResultStore, result_store_name
+
+CHANNELS = [("UCabcdefghijklmnopqrstuv", "UUabcdefghijklmnopqrstuv")]
+
+def test_crawls_fetch_only_uploads_newer_than_the_last_one(tmp_path, youtube_stub):
+    video_data_path, new_videos = crawl_channel_uploads(str(tmp_path), channels=CHANNELS)
+    assert new_videos == 200
+    assert read_video_ids(str(tmp_path))[:2] == ["abcde000000", "abcde000001"]
+    result_store = ResultStore(str(tmp_path / result_store_name))
+    assert result_store.get_sync_state(CHANNELS[0][0])[0] == "abcde000000"
+
+    # Nothing new: one page is listed, and the video sheet is left as it was
+    youtube_stub.clear()
+    assert crawl_channel_uploads(str(tmp_path), channels=CHANNELS) == (video_data_path, 0)
+    assert [endpoint for endpoint, _, _ in youtube_stub] == ["playlistItems"]
+    assert len(read_video_ids(str(tmp_path))) == 200
+
+    # Three uploads newer than the recorded one
+    result_store.set_sync_state(*CHANNELS[0], "abcde000003", "")
+    assert crawl_channel_uploads(str(tmp_path), channels=CHANNELS)[1] == 3
+    assert read_video_ids(str(tmp_path)) == ["abcde000000", "abcde000001", "abcde000002"]
+    assert result_store.get_sync_state(CHANNELS[0][0])[0] == "abcde000000"
+
+def test_partial_listings_do_not_move_the_sync_state(tmp_path, failing_pages):
+    failing_pages.add("100")
+    assert crawl_channel_uploads(str(tmp_path), channels=CHANNELS)[1] == 100
+    result_store = ResultStore(str(tmp_path / result_store_name))
+    assert result_store.get_sync_state(CHANNELS[0][0]) == (None, None)
+
+    # The next crawl lists every upload again, including those the failed page held back
+    failing_pages.clear()
+    assert crawl_channel_uploads(str(tmp_path), channels=CHANNELS)[1] == 200
+    assert result_store.get_sync_state(CHANNELS[0][0])[0] == "abcde000000"
@@ -0,0 +1,9 @@
+"""Tests of the typed conversion of API values."""
+import pandas as pd
+
+from flux.schema import parse_iso_durations
+
+def test_parse_iso_durations():
+    durations = parse_iso_durations(["PT1H2M3S", "PT45S", "P1DT1S", "P1W", "P0D", "PT1.6S", "", "bad", None])
+    assert durations.tolist() == [3723, 45, 86401, 604800, 0, 2, pd.NA, pd.NA, pd.NA]
+    assert str(durations.dtype) == "Int64"
@@ -0,0 +1,61 @@
+"""Tests of the append-only result store and the Excel export."""
+import pandas as pd
+from openpyxl import load_workbook
+
+from flux.pipeline import write_transcript_outputs
+from flux.store import TRANSCRIPT_COLUMN_WIDTHS, ResultStore, export_to_excel
+
+# Function to read an Excel file as a list of row tuples, header included
+def read_excel_rows(path):
+    return [tuple(row) for row in load_workbook(path).active.iter_rows(values_only=True)]
+
+def test_runs_are_kept_apart_and_new_columns_added(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    store.append("videos", "run1", [{"Video ID": "a", "Title": "A"}])
+    store.append("videos", "run2", [{"Video ID": "b", "Title": "B", "Duration": 61}])
+    store.append("videos", "run1", [{"Video ID": "c", "Title": "C"}])
+
+    assert store.latest_run("videos") == "run1"
+    frame = store.read_frame("videos", "run1")
+    assert list(frame.columns) == ["Video ID", "Title", "Duration"]
+    assert frame["Video ID"].tolist() == ["a", "c"]
+    assert frame["Duration"].isna().all()
+    assert store.read_frame("videos", "run2")["Duration"].tolist() == [61]
+    assert store.latest_run("channels") is None
+
+def test_typed_frames_are_stored_as_text_and_null(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    frame = pd.DataFrame({
+        "Published At": pd.to_datetime(["2024-01-02T03:04:05+09:00", None], utc=True),
+        "Made For Kids": pd.array([True, None], dtype="boolean"),
+    })
+    store.append_frame("videos", "run1", frame)
+    assert list(store.iter_rows("videos", "run1")[1]) == [("2024-01-01 18:04:05", 1), (None, None)]
+
+def test_export_selects_converts_and_sizes_columns(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    store.append("videos", "run1", [{"Video ID": "a", "Views": "10"}, {"Video ID": "b", "Views": "20"}])
+    store.append("videos", "run2", [{"Video ID": "z", "Views": "0"}])
+
+    excel_path = str(tmp_path / "videos.xlsx")
+    export_to_excel(
+        store, "videos", excel_path, "run1", column_widths={"Views": 12},
+        columns=["Views", "Video ID", "Missing"], converters={"Views": int},
+    )
+    assert read_excel_rows(excel_path) == [("Views", "Video ID", "Missing"), (10, "a", None), (20, "b", None)]
+    assert load_workbook(excel_path).active.column_dimensions["A"].width == 12
+
+def test_transcript_outputs_hold_only_their_own_file(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    for name in ("first", "second"):
+        data = [["00:00", "00:02", f"{name} one"], ["00:02", "00:05", f"{name} two"]]
+        write_transcript_outputs(
+            store, "run1", str(tmp_path / f"{name}.mp3"), data,
+            str(tmp_path / f"{name}.xlsx"), str(tmp_path / f"{name}.txt"),
+        )
+
+    assert read_excel_rows(tmp_path / "second.xlsx") == [
+        tuple(TRANSCRIPT_COLUMN_WIDTHS), ("00:00", "00:02", "second one"), ("00:02", "00:05", "second two"),
+    ]
+    assert (tmp_path / "second.txt").read_text(encoding="utf-8") == "second one\nsecond two\n"
+    assert store.read_frame("transcripts", "run1")["Source"].tolist() == ["first", "first", "second", "second"]
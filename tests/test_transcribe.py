@@ -0,0 +1,98 @@
+"""Tests of the transcript cache, and of the transcription pool against the Whisper API stub."""
+import functools
+import os
+import shutil
+
+import pytest
+import stubs
+
+from flux import transcribe
+from flux.audio import split_audio
+from flux.transcribe import TranscriptCache, transcribe_chunk, transcribe_chunk_cached, transcribe_files
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+# 120 s at 32 kbps is uploaded as is and split into 3 chunks of at most 200 kB, cut at 39 s and 79 s
+@pytest.fixture
+def talk_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcribe, "split_audio", functools.partial(split_audio, max_chunk_bytes=200_000))
+    monkeypatch.setattr(transcribe, "WHISPER_MAX_BYTES", 200_000)
+    return stubs.make_synthetic_mp3(str(tmp_path / "talk.mp3"), 120, bitrate="32k")
+
+@requires_ffmpeg
+def test_rows_follow_chunk_order_whatever_finishes_first(talk_file, whisper_stub):
+    whisper_stub.delays = [0.5]  # The first chunk to arrive is answered last
+    [(file_path, rows, errors, from_cache)] = transcribe_files([talk_file])
+    assert file_path == talk_file and errors == [] and not from_cache
+    assert [row[0] for row in rows] == ["00:00", "00:05", "00:39", "00:44", "01:19", "01:24"]
+    assert len(whisper_stub.requests) == 3
+    assert os.listdir(os.path.dirname(talk_file)) == ["talk.mp3"]  # Chunks removed
+
+@requires_ffmpeg
+def test_rate_limits_and_server_errors_are_retried(monkeypatch, talk_file, whisper_stub):
+    monkeypatch.setattr(transcribe, "retry_delay", lambda error, attempt: 0)
+    whisper_stub.statuses = [429, 500, 503]
+    assert len(transcribe_chunk(talk_file)["segments"]) == 2
+    assert len(whisper_stub.requests) == 4
+
+    whisper_stub.statuses = [429, 429]
+    with pytest.raises(transcribe.RateLimitError):
+        transcribe_chunk(talk_file, retries=1)
+
+@requires_ffmpeg
+def test_failed_chunks_are_reported_and_not_cached(tmp_path, talk_file, whisper_stub):
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    whisper_stub.statuses = [400]  # Not retryable
+    [(_, rows, errors, _)] = transcribe_files([talk_file], workers=1, cache=cache)
+    assert len(errors) == 1 and isinstance(errors[0][1], transcribe.APIStatusError)
+    assert len(rows) == 4  # The other two chunks still give rows
+
+    # The incomplete transcript is not cached at file level: only the failed chunk is sent again
+    [(_, rows, errors, from_cache)] = transcribe_files([talk_file], cache=cache)
+    assert (len(rows), errors, from_cache) == (6, [], False)
+    assert len(whisper_stub.requests) == 4
+
+    [(_, rows, errors, from_cache)] = transcribe_files([talk_file], cache=cache)
+    assert (len(rows), errors, from_cache) == (6, [], True)
+    assert len(whisper_stub.requests) == 4
+
+def test_digests_are_remembered_until_the_file_changes(tmp_path, monkeypatch):
+    hashed = []
+    sha256 = transcribe.hashlib.sha256
+    monkeypatch.setattr(transcribe.hashlib, "sha256", lambda: hashed.append(1) or sha256())
+    audio_path = tmp_path / "a.mp3"
+    audio_path.write_bytes(b"first")
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    digest = cache.file_digest(str(audio_path))
+    cache.save_index()
+
+    # A new cache loads the index and does not read the unchanged file again
+    reloaded = TranscriptCache(str(tmp_path / "cache"))
+    assert reloaded.file_digest(str(audio_path)) == digest
+    assert len(hashed) == 1
+
+    audio_path.write_bytes(b"second, longer")
+    assert reloaded.file_digest(str(audio_path)) != digest
+    chunk_path = tmp_path / "a_part0.mp3"
+    chunk_path.write_bytes(b"chunk")
+    reloaded.file_digest(str(chunk_path), remember=False)
+    assert list(reloaded.digests) == [str(audio_path)]
+
+def test_entries_are_keyed_by_kind_model_and_preprocessing(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    entry = {"chunk_start_times": [0], "offset_map": [], "results": [{"segments": []}]}
+    cache.put("ab" * 32, "file", entry, variant="mp3-16000-32k")
+    assert cache.get("ab" * 32, "file", variant="mp3-16000-32k") == entry
+    assert cache.get("ab" * 32, "file", variant="mp3-16000-32k-trim2.0-0.5") is None
+    assert cache.get("ab" * 32, "file") is None
+    assert cache.get("ab" * 32, "chunk", variant="mp3-16000-32k") is None
+    assert cache.get("ab" * 32, "file", model="other", variant="mp3-16000-32k") is None
+
+def test_cached_chunks_are_not_sent_again(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(transcribe, "transcribe_chunk", lambda chunk_path: calls.append(chunk_path) or {"segments": [{"text": "x"}]})
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    for name in ("a_part0.mp3", "b_part3.mp3"):  # Same audio under another name
+        (tmp_path / name).write_bytes(b"chunk")
+        assert transcribe_chunk_cached(str(tmp_path / name), cache) == {"segments": [{"text": "x"}]}
+    assert calls == [str(tmp_path / "a_part0.mp3")]
@@ -0,0 +1,92 @@
+"""Tests of the YouTube API layer against the stub server: response cache, ETag revalidation, eviction and playlists."""
+import copy
+
+import pytest
+import stubs
+
+from flux import youtube
+from flux.youtube import CHANNEL_PARTS, PART_TTLS, VIDEO_PARTS, ApiCache, fetch_items_by_id, list_playlist_videos
+
+# Function to read (expires_at - fetched_at) of one cache entry
+def entry_ttl(cache, resource, item_id, part):
+    return cache.conn.execute(
+        "SELECT expires_at - fetched_at FROM items WHERE key = ?", (cache.make_key(resource, item_id, part),)
+    ).fetchone()[0]
+
+def test_ttl_follows_the_parts_an_item_contains(tmp_path):
+    cache = ApiCache(str(tmp_path / "cache.sqlite3"))
+    video = copy.deepcopy(stubs.YouTubeStubHandler.video_item)
+    live_video = dict(copy.deepcopy(video), id="live0000000", liveStreamingDetails={"concurrentViewers": "10"})
+    cache.put_many("videos", {video["id"]: video, live_video["id"]: live_video}, VIDEO_PARTS)
+    cache.put_many("handles", {"@foo": {"channelId": "UCx"}}, "id")
+
+    # A video that never was live is not held to the 5 minute TTL of liveStreamingDetails
+    assert entry_ttl(cache, "videos", video["id"], VIDEO_PARTS) == pytest.approx(PART_TTLS["statistics"])
+    assert entry_ttl(cache, "videos", "live0000000", VIDEO_PARTS) == pytest.approx(PART_TTLS["liveStreamingDetails"])
+    assert entry_ttl(cache, "handles", "@foo", "id") == pytest.approx(PART_TTLS["id"])
+
+def test_fresh_items_are_served_from_the_cache(youtube_stub):
+    video_ids = [f"video{i:06d}" for i in range(60)]
+    first = fetch_items_by_id("videos", video_ids + video_ids[:5], VIDEO_PARTS)
+    assert list(first) == video_ids
+    assert [endpoint for endpoint, _, _ in youtube_stub] == ["videos", "videos"]  # 50 + 10 IDs
+
+    assert fetch_items_by_id("videos", video_ids, VIDEO_PARTS) == first
+    assert len(youtube_stub) == 2
+
+def test_stale_batches_are_revalidated_with_their_etag(youtube_stub):
+    channel_ids = [f"UC{i:022d}" for i in range(3)]
+    first = fetch_items_by_id("channels", channel_ids, CHANNEL_PARTS)
+    cache = youtube.get_api_cache()
+    cache.conn.execute("UPDATE items SET expires_at = 0")
+    cache.conn.commit()
+
+    # The stub answers 304, the cached items are returned and fresh again
+    assert fetch_items_by_id("channels", channel_ids, CHANNEL_PARTS) == first
+    assert youtube_stub[-1][2] == "bench"
+    assert cache.get_many("channels", channel_ids, CHANNEL_PARTS)[1] == []
+    assert fetch_items_by_id("channels", channel_ids, CHANNEL_PARTS) == first
+    assert len(youtube_stub) == 2
+
+    # Without every item of the batch in the cache, a 304 would leave gaps, so no ETag is sent
+    cache.conn.execute("UPDATE items SET expires_at = 0")
+    cache.conn.execute("DELETE FROM items WHERE key = ?", (cache.make_key("channels", channel_ids[0], CHANNEL_PARTS),))
+    cache.conn.commit()
+    assert fetch_items_by_id("channels", channel_ids, CHANNEL_PARTS) == first
+    assert youtube_stub[-1][2] is None
+
+def test_lru_eviction_drops_items_and_batch_etags(tmp_path):
+    cache = ApiCache(str(tmp_path / "cache.sqlite3"), max_bytes=10 ** 9)
+    body = {"id": "x", "snippet": {"title": "t" * 200}}
+    for i in range(10):
+        cache.put_many("videos", {f"v{i}": dict(body, id=f"v{i}")}, "snippet")
+        cache.put_batch_etag("videos", [f"v{i}"], "snippet", f"etag{i}")
+    cache.get_many("videos", ["v0"], "snippet")  # v0 becomes the most recently used item
+    cache.get_batch_etag("videos", ["v0"], "snippet")
+
+    item_size = cache.conn.execute("SELECT MAX(size) FROM items").fetchone()[0]
+    cache.max_bytes = 5 * item_size
+    with cache.lock:
+        cache.evict()
+
+    kept = {row[0].rsplit("|", 1)[1] for row in cache.conn.execute("SELECT key FROM items")}
+    assert "v0" in kept and "v1" not in kept and len(kept) < 10
+    assert cache.get_batch_etag("videos", ["v0"], "snippet") == "etag0"
+    assert cache.get_batch_etag("videos", ["v1"], "snippet") is None
+
+def test_playlists_are_listed_newest_first_until_the_last_known_upload(youtube_stub):
+    videos, complete = list_playlist_videos("UUabcdefghijklmnopqrstuv")
+    assert complete and len(videos) == 200 and len(youtube_stub) == 4
+    assert [video_id for video_id, _ in videos[:2]] == ["abcde000000", "abcde000001"]
+    assert videos[0][1] > videos[1][1]
+
+    # Listing stops at the newest upload of the previous crawl, or at its publish time when that video is gone
+    youtube_stub.clear()
+    assert list_playlist_videos("UUabcdefghijklmnopqrstuv", stop_at_video_id="abcde000060") == (videos[:60], True)
+    assert len(youtube_stub) == 2
+    assert list_playlist_videos("UUabcdefghijklmnopqrstuv", stop_at_video_id="gone", published_after=videos[3][1]) == (videos[:3], True)
+
+def test_a_failed_page_marks_the_listing_incomplete(failing_pages):
+    failing_pages.add("50")
+    videos, complete = list_playlist_videos("UUabcdefghijklmnopqrstuv")
+    assert not complete and len(videos) == 50